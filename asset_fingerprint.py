@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Asset Fingerprint
+=================
+Serve static assets under content-hashed names so they can be cached as
+immutable, and rewrite every reference to them.
+
+Every stylesheet, script and image referenced from a page's src, href or
+srcset attribute gets a copy named assets/<path>.<hash>.<ext> (e.g.
+assets/index.1a2b3c4d.css); git stores the identical content once. MP3s keep
+their path and get a content-hash query instead (/audio/首都圏11番.mp3?v=5e6f7a8b):
+a hashed copy would ship the whole library twice.
+Only page markup is rewritten. The JSON the pages' scripts fetch
+(stations.json, data/ shards, radio/ playlists) keeps plain audio paths, which
+are revalidated like any other unhashed URL.
+Copies are real copies rather than hard links, so editing a source in place
+never changes what an already published hashed URL serves. References are
+rewritten to the site-absolute hashed path; references that are already hashed
+are mapped back to their source first, so re-running after an asset changes
+swaps the old hash for the new one.
+
+assets/manifest.json records the hash of every asset, plus the content hash
+and referenced asset hashes of every page, and whether each reference was
+written relative or site-absolute so --restore puts it back exactly. It holds
+no mtimes, so a fresh clone finds it up to date; hashes are cached by (size,
+mtime) in .fingerprint_cache.json instead. A re-run only reads pages that
+were regenerated or whose referenced assets changed, in one parallel pass.
+Copies that are no longer referenced are removed.
+
+build.py runs this after the other stages that rewrite pages (headers,
+images, critical CSS, resource hints). A page one of them rewrites again gets
+plain references back and is fingerprinted again on the next pass.
+
+Usage:
+    python asset_fingerprint.py              # fingerprint and rewrite
+    python asset_fingerprint.py --restore    # back to the plain filenames
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import posixpath
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import unquote
+
+from build_utils import load_manifest, save_manifest
+from file_hashes import FileHasher
+from update_headers import find_html_files
+
+ASSET_DIR = Path('assets')
+MANIFEST_FILE = ASSET_DIR / 'manifest.json'
+CACHE_FILE = Path('.fingerprint_cache.json')
+
+EXTENSIONS = {'.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.svg', '.ico', '.mp3'}
+# Versioned with ?v=<hash> on their own path instead of copied
+VERSIONED = {'.mp3'}
+# Must keep a stable URL (the service worker is looked up by its address)
+STABLE = {'sw.js'}
+HASH_LENGTH = 8
+
+REFERENCE = re.compile(r'\b(src|href|srcset)="([^"]*)"')
+HASHED = re.compile(rf'^{ASSET_DIR}/(?P<stem>.+)\.[0-9a-f]{{{HASH_LENGTH}}}(?P<ext>\.[^./]+)$')
+VERSION = re.compile(rf'\?v=[0-9a-f]{{{HASH_LENGTH}}}(?=#|$)')
+EXTERNAL = re.compile(r'^(?:[a-z][a-z0-9+.-]*:|//|#)', re.IGNORECASE)
+
+# Set in each worker process by init_worker
+_MAPPING: Dict[str, str] = {}
+
+
+def hashed_name(logical: str, digest: str) -> str:
+    """Return the fingerprinted path of an asset, e.g. assets/index.1a2b3c4d.css or audio/x.mp3?v=1a2b3c4d."""
+    stem, ext = posixpath.splitext(logical)
+    if ext.lower() in VERSIONED:
+        return f"{logical}?v={digest[:HASH_LENGTH]}"
+    return f"{ASSET_DIR}/{stem}.{digest[:HASH_LENGTH]}{ext}"
+
+
+def unhash(path: str) -> str:
+    """Map a fingerprinted path back to its source path (other paths unchanged)."""
+    path = VERSION.sub('', path)
+    match = HASHED.match(path)
+    return match.group('stem') + match.group('ext') if match else path
+
+
+def logical_path(value: str, page: str) -> Optional[str]:
+    """Resolve a reference on a page to a source asset path, or None if it is not one."""
+    if not value or EXTERNAL.match(value):
+        return None
+    path = unquote(re.split(r'[?#]', value, maxsplit=1)[0])
+    if path.startswith('/'):
+        path = path.lstrip('/')
+    else:
+        path = posixpath.join(posixpath.dirname(page), path)
+    path = unhash(posixpath.normpath(path))
+    if path.startswith('..') or posixpath.splitext(path)[1].lower() not in EXTENSIONS:
+        return None
+    if path in STABLE:
+        return None
+    return path
+
+
+def rewrite_value(value: str, page: str, state: Dict) -> str:
+    """Return a single src/href value pointing at the current fingerprint.
+
+    state['forms'] collects, per asset reference in document order, whether
+    the source reference was relative ('r') or site-absolute ('a');
+    state['old'] holds the forms recorded by the previous run.
+    """
+    logical = logical_path(value, page)
+    if logical is None:
+        return value
+    state['refs'].add(logical)
+    path = re.split(r'[?#]', value, maxsplit=1)[0]
+    suffix = value[len(path):]
+    version = VERSION.match(suffix)
+    if version:
+        suffix = suffix[version.end():]
+    fingerprinted = version or HASHED.match(unquote(path.lstrip('/')))
+    index = len(state['forms'])
+    if fingerprinted:
+        form = state['old'][index] if index < len(state['old']) else 'a'
+    else:
+        form = 'a' if path.startswith('/') else 'r'
+    state['forms'].append(form)
+
+    if logical in _MAPPING:
+        return '/' + _MAPPING[logical] + suffix
+    if fingerprinted:
+        # Fingerprinted before but no longer mapped (e.g. --restore): put back the original form
+        if form == 'r':
+            return posixpath.relpath(logical, posixpath.dirname(page) or '.') + suffix
+        return '/' + logical + suffix
+    return value
+
+
+def rewrite_content(content: str, page: str, old_forms: str = '') -> tuple:
+    """Rewrite every src/href/srcset reference; return (content, referenced assets, forms)."""
+    state = {'refs': set(), 'forms': [], 'old': old_forms}
+
+    def replace(match):
+        attr, value = match.group(1), html.unescape(match.group(2))
+        if attr == 'srcset':
+            candidates = []
+            for candidate in value.split(','):
+                parts = candidate.strip().split(None, 1)
+                if parts:
+                    parts[0] = rewrite_value(parts[0], page, state)
+                    candidates.append(' '.join(parts))
+            new = ', '.join(candidates)
+        else:
+            new = rewrite_value(value, page, state)
+        if new == value:
+            return match.group(0)
+        return f'{attr}="{html.escape(new)}"'
+
+    return REFERENCE.sub(replace, content), state['refs'], ''.join(state['forms'])
+
+
+def init_worker(mapping: Dict[str, str]):
+    global _MAPPING
+    _MAPPING = mapping
+
+
+def rewrite_page(job: tuple) -> Dict:
+    """Point one page at the current fingerprints (runs in a worker process)."""
+    page, old_forms = job
+    with open(page, 'r', encoding='utf-8') as f:
+        content = f.read()
+    updated, refs, forms = rewrite_content(content, page, old_forms)
+    if updated != content:
+        with open(page, 'w', encoding='utf-8') as f:
+            f.write(updated)
+    return {'page': page, 'sha256': hashlib.sha256(updated.encode('utf-8')).hexdigest(),
+            'refs': sorted(refs), 'forms': forms, 'written': updated != content}
+
+
+def find_assets() -> List[str]:
+    """Return every file in the site tree that may be fingerprinted."""
+    assets = []
+    for root, dirs, files in os.walk('.'):
+        dirs[:] = [d for d in dirs if not d.startswith(('.', 'node_modules', '__pycache__'))
+                   and not (root == '.' and d == ASSET_DIR.name)]
+        for name in files:
+            path = posixpath.normpath(posixpath.join(root, name))
+            if posixpath.splitext(name)[1].lower() in EXTENSIONS and path not in STABLE:
+                assets.append(path)
+    return sorted(assets)
+
+
+def copy_asset(source: str, target: str):
+    Path(target).parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(source, target)
+
+
+def fingerprint(pages: List[str], restore: bool = False, workers: Optional[int] = None) -> Dict:
+    manifest = load_manifest(MANIFEST_FILE, {'files': {}, 'pages': {}})
+    old_pages = manifest['pages']
+    cache = load_manifest(CACHE_FILE)
+    hasher = FileHasher(cache)
+
+    if restore:
+        mapping = {}
+    else:
+        assets = find_assets()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            digests = list(pool.map(hasher.digest, assets))
+        mapping = {path: hashed_name(path, digest) for path, digest in zip(assets, digests)}
+        manifest['files'] = dict(zip(assets, digests))
+
+    # A page needs a pass if it changed on disk or one of its assets got a new hash
+    stale = []
+    for page in pages:
+        record = old_pages.get(page)
+        if (restore or not record or record.get('sha256') != hasher.digest(page)
+                or any(mapping.get(ref) != target for ref, target in record['assets'].items())):
+            stale.append(page)
+
+    new_pages = {page: old_pages[page] for page in pages if page not in stale}
+    written = 0
+    if stale:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(mapping,)) as pool:
+            jobs = [(page, old_pages.get(page, {}).get('forms', '')) for page in stale]
+            for result in pool.map(rewrite_page, jobs, chunksize=32):
+                written += result['written']
+                new_pages[result['page']] = {'sha256': result['sha256'],
+                                             'assets': {ref: mapping.get(ref) for ref in result['refs']},
+                                             'forms': result['forms']}
+
+    referenced = set()
+    for record in new_pages.values():
+        referenced.update(record['assets'])
+
+    targets = {mapping[ref] for ref in referenced if ref in mapping}
+    needed = {target for target in targets if HASHED.match(target)}
+    for target in sorted(needed):
+        if not Path(target).exists():
+            copy_asset(unhash(target), target)
+    removed = 0
+    if ASSET_DIR.exists():
+        for path in ASSET_DIR.rglob('*'):
+            if path.is_file() and HASHED.match(path.as_posix()) and path.as_posix() not in needed:
+                path.unlink()
+                removed += 1
+        for directory in sorted(ASSET_DIR.rglob('*'), reverse=True):
+            if directory.is_dir() and not any(directory.iterdir()):
+                directory.rmdir()
+
+    if restore:
+        if MANIFEST_FILE.exists():
+            MANIFEST_FILE.unlink()
+        if ASSET_DIR.exists() and not any(ASSET_DIR.iterdir()):
+            ASSET_DIR.rmdir()
+    else:
+        manifest['pages'] = dict(sorted(new_pages.items()))
+        save_manifest(MANIFEST_FILE, manifest)
+        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({path: cache[path] for path in [*assets, *pages] if path in cache}, f, ensure_ascii=False)
+    return {'pages': len(pages), 'scanned': len(stale), 'written': written,
+            'assets': len(needed), 'versioned': len(targets - needed), 'removed': removed}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Fingerprint static assets and rewrite references')
+    parser.add_argument('--restore', action='store_true', help='Restore plain asset filenames')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    pages = find_html_files(include_index=True)
+    stats = fingerprint(pages, args.restore, args.workers)
+    print(f"🔖 {stats['pages']} pages: {stats['scanned']} scanned, {stats['written']} rewritten; "
+          f"{stats['assets']} hashed copies, {stats['versioned']} versioned in place, "
+          f"{stats['removed']} stale copies removed")
+
+
+if __name__ == '__main__':
+    main()
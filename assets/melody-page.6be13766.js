@@ -0,0 +1,154 @@
+// Melody page: fetch this melody's data shard and render its stations grouped by company and line.
+// melody-template.html links this from every melody page; edit it here, not in the pages.
+document.addEventListener('DOMContentLoaded', () => {
+  // Melody name from template or URL
+  const melodyFromTemplate = (document.getElementById('melodyTitle') && document.getElementById('melodyTitle').textContent.trim()) || '';
+
+  // Helper to get basename without extension
+  function basenameNoExt(p) {
+    return p.split('/').pop().replace(/\.[^.]+$/, '');
+  }
+
+  // Per-melody shard from data_shards.py (mirrors the page path); fall back to the full catalog
+  fetch('/data' + window.location.pathname.replace(/\.html$/, '.json'))
+    .then(res => res.ok ? res.json() : fetch('/stations.json').then(r => r.json()))
+    .then(all => {
+      // Find candidate entries that match either file basename or melody name
+      const candidates = all.filter(s => {
+        if (!s) return false;
+        const melodyName = (s.melody || '').trim();
+        const fileName = s.file ? basenameNoExt(s.file.trim()) : '';
+
+        // Match priority: exact file basename matches page melody, or melody text matches
+        if (fileName && melodyFromTemplate && (fileName === melodyFromTemplate || fileName === melodyFromTemplate.replace(/\s+/g, ''))) return true;
+        if (melodyName && melodyFromTemplate && (melodyName === melodyFromTemplate || melodyName.includes(melodyFromTemplate) || melodyFromTemplate.includes(melodyName))) return true;
+
+        // Also allow if URL contains melody filename
+        const urlName = decodeURIComponent(window.location.pathname.split('/').pop().replace('.html',''));
+        if (fileName && urlName && (fileName === urlName || basenameNoExt(urlName) === fileName)) return true;
+
+        return false;
+      });
+
+      if (!candidates.length) {
+        document.getElementById('melody-stations-container').innerHTML = '<p style="text-align:center;color:#888;">このメロディーを使用する駅が見つかりませんでした。</p>';
+        return;
+      }
+
+      // Set background from a random line (logos are already pre-rendered by generator)
+      const headerEl = document.querySelector('.melody-header');
+      const existingLogos = document.querySelectorAll('#station-line-logos img');
+      if (headerEl && existingLogos.length > 0) {
+        const randomLogo = existingLogos[Math.floor(Math.random() * existingLogos.length)];
+        const lineName = randomLogo.alt.replace('ロゴ', '').trim();
+        headerEl.style.setProperty('--station-bg-image', `url("/images/${lineName}.jpg")`);
+      }
+
+      // Group by company then by line
+      const companies = [
+        { id: 'jr', name: 'JR東日本' },
+        { id: 'metro', name: '東京メトロ' },
+        { id: 'toei', name: '都営地下鉄' },
+        { id: 'archive', name: '過去のメロディ' }
+      ];
+
+      function render(filter='') {
+        const container = document.getElementById('melody-stations-container');
+        const f = filter.trim().toLowerCase();
+        container.innerHTML = companies.map(company => {
+          const companyEntries = candidates.filter(e => e.company === company.name || (company.id==='archive' && (e.company==='過去のメロディ' || e.status==='過去')));
+          if (!companyEntries.length) return '';
+
+          // group by line
+          const linesMap = {};
+          companyEntries.forEach(m => {
+            const lineKey = m.line || 'その他';
+            if (!linesMap[lineKey]) linesMap[lineKey] = [];
+            linesMap[lineKey].push(m);
+          });
+
+          return `
+            <section style="margin-bottom:28px;">
+              <h2 style="color:#1976d2; margin-bottom:12px; text-align:center;">${company.name}</h2>
+              ${Object.entries(linesMap).map(([line, list]) => {
+                const filterLower = f;
+                const visibleList = list.filter(m => {
+                  return (!filterLower) || (m.station && m.station.toLowerCase().includes(filterLower)) || (m.melody && m.melody.toLowerCase().includes(filterLower)) || (line && line.toLowerCase().includes(filterLower));
+                });
+                if (!visibleList.length && !line.toLowerCase().includes(filterLower)) return '';
+
+                const logoSrc = `/images/${line}.png`;
+                let basePath = '';
+                if (company.id === 'jr') basePath = '/jr-east';
+                else if (company.id === 'metro') basePath = '/tokyo-metro';
+                else if (company.id === 'toei') basePath = '/toei';
+                else basePath = '/archive';
+                const lineUrl = `${basePath}/${encodeURIComponent(line)}.html`;
+
+                return `
+                  <div style="border:1px solid #ddd; border-radius:16px; background:#fafafa; padding:18px; margin-bottom:20px;">
+                    <div style="display:flex; align-items:center; gap:8px; margin-bottom:12px;">
+                      <img src="${logoSrc}" alt="${line}ロゴ" style="max-width:24px; height:auto;">
+                      <h3 style="margin:0; font-size:1.1em;"><a href="${lineUrl}" style="color:#1976d2; text-decoration:underline;">${line}</a></h3>
+                    </div>
+                    ${visibleList.map(st => `
+                      <div style="padding:10px 12px; border-bottom:1px solid #eee; display:flex; justify-content:space-between; align-items:center;">
+                        <div style="text-align:left;">
+                          <a href="/stations/${encodeURIComponent(st.station)}.html" style="font-weight:700; color:#1976d2; text-decoration:underline;">${st.station}</a>
+                          <div style="font-size:0.95em; color:#666;">${st.melody || ''}${st.direction ? ` (${st.direction})` : ''}</div>
+                        </div>
+                        <div style="font-size:0.9em; color:#888;">${st.company || ''}</div>
+                      </div>
+                    `).join('')}
+                  </div>
+                `;
+              }).join('')}
+            </section>
+          `;
+        }).join('');
+      }
+
+      render();
+      document.getElementById('line-filter').addEventListener('input', e => render(e.target.value));
+
+      // Loop checkbox wiring for hero audio (works when generator injects the audioBlock with #melodyAudio and #melodyLoop)
+      const melodyAudio = document.getElementById('melodyAudio');
+      const melodyLoop = document.getElementById('melodyLoop');
+      // The generator points src at the preview clip and data-full at the full file.
+      // The clip never loops on its own; the full file takes over once it has loaded, or when the clip ends.
+      const onPreview = () => !!(melodyAudio && melodyAudio.dataset.full);
+      function switchToFull() {
+        const full = melodyAudio.dataset.full;
+        if (!full) return;
+        delete melodyAudio.dataset.full;
+        const at = melodyAudio.currentTime;
+        const resume = !melodyAudio.paused || melodyAudio.ended;
+        melodyAudio.src = full;
+        melodyAudio.loop = !!(melodyLoop && melodyLoop.checked);
+        melodyAudio.addEventListener('loadedmetadata', () => {
+          melodyAudio.currentTime = at;
+          if (resume) melodyAudio.play().catch(err => console.log('Autoplay prevented:', err));
+        }, { once: true });
+      }
+      if (onPreview()) {
+        melodyAudio.addEventListener('play', () => {
+          const loader = new Audio();
+          loader.preload = 'auto';
+          loader.addEventListener('canplaythrough', switchToFull, { once: true });
+          loader.src = melodyAudio.dataset.full;
+        }, { once: true });
+        melodyAudio.addEventListener('ended', switchToFull);
+      }
+
+      if (melodyAudio && melodyLoop) {
+        // Initialize checkbox to current loop state
+        melodyLoop.checked = !!melodyAudio.loop;
+        melodyLoop.addEventListener('change', () => {
+          melodyAudio.loop = melodyLoop.checked && !onPreview();
+        });
+      }
+
+    }).catch(err => {
+      console.error('Failed to load stations.json for melody page', err);
+    });
+});
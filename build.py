@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Ekimero Build
+=============
+Run the site's generator scripts as a dependency graph instead of by hand.
+
+Each stage declares its command, input globs and output globs. A stage is
+skipped when the content hash of its inputs matches the last successful run
+and its outputs still exist. File hashes are cached by (size, mtime), so a
+no-op rebuild only stats files. Several stages rewrite pages in place (headers,
+images, critical CSS, resource hints, fingerprints), so every stage's inputs
+are recorded once the whole build has finished: what a later stage wrote
+counts as output of the same build, and running it again is a no-op. Stages whose dependencies are done run in
+parallel, and a critical-path timing report is printed at the end.
+
+listing_shards.py replaces the removed generate_all_pages.js and ssg.js (it
+also writes all-pages.html and stations.html), and sitemap.py replaces
+generate_sitemap.js.
+
+Usage:
+    python build.py                   # build what changed
+    python build.py --dry-run         # show what would run
+    python build.py --force           # rebuild everything
+    python build.py sitemap           # build one stage and its dependencies
+    python build.py --list            # show the stage graph
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from file_hashes import FileHasher
+
+CACHE_FILE = Path('.build_cache.json')
+
+PAGE_GLOBS = ['*.html', '*/*.html', '*/*/*.html']
+
+STAGES = {
+    'unused-melodies': {
+        'command': [sys.executable, 'melodies.py'],
+        'stdout': 'unused_melodies.json',
+        'inputs': ['melodies.py'],
+        'outputs': ['unused_melodies.json'],
+        'deps': [],
+    },
+    'melody-inventory': {
+        'command': [sys.executable, 'stationmelodies.py'],
+        'inputs': ['stationmelodies.py', 'stations.json', 'audio/*.mp3'],
+        'outputs': ['existing_melodies.txt', 'missing_melodies.txt'],
+        'deps': [],
+    },
+    # Writes "preview" fields into stations.json, so it runs before every stage that reads it
+    'previews': {
+        'command': [sys.executable, 'preview_clips.py'],
+        'inputs': ['preview_clips.py', 'mp3_frames.py', 'stations.json',
+                   'missing_melodies.txt', 'audio/*.mp3'],
+        'outputs': ['audio/previews/manifest.json'],
+        'deps': ['melody-inventory'],
+    },
+    'station-pages': {
+        'command': ['node', 'generate_station_pages.js'],
+        'inputs': ['generate_station_pages.js', 'station-template.html', 'stations.json'],
+        'outputs': ['stations/*.html'],
+        'deps': ['previews'],
+    },
+    'line-pages': {
+        'command': ['node', 'generate_line_pages.js'],
+        'inputs': ['generate_line_pages.js', 'line-template.html', 'stations.json'],
+        'outputs': ['jr-east/*.html', 'tokyo-metro/*.html', 'toei/*.html'],
+        'deps': ['previews'],
+    },
+    'melody-pages': {
+        'command': ['node', 'generate_melody_pages.js'],
+        'inputs': ['generate_melody_pages.js', 'melody-template.html', 'stations.json'],
+        'outputs': ['melodies/*.html'],
+        'deps': ['previews'],
+    },
+    'radio-playlists': {
+        'command': [sys.executable, 'radio_playlists.py'],
+        'inputs': ['radio_playlists.py', 'mp3_frames.py', 'stations.json',
+                   'missing_melodies.txt', 'audio/*.mp3'],
+        'outputs': ['radio/index.json'],
+        'deps': ['previews'],
+    },
+    'data-shards': {
+        'command': [sys.executable, 'data_shards.py'],
+        'inputs': ['data_shards.py', 'stations.json'],
+        'outputs': ['data/manifest.json'],
+        'deps': ['previews'],
+    },
+    'listings': {
+        'command': [sys.executable, 'listing_shards.py'],
+        'inputs': ['listing_shards.py', 'stations.json', *PAGE_GLOBS],
+        'outputs': ['stations.html', 'all-pages.html', 'listings/manifest.json'],
+        'deps': ['station-pages', 'line-pages', 'melody-pages'],
+    },
+    'headers': {
+        'command': [sys.executable, 'update_headers.py'],
+        'inputs': ['update_headers.py', *PAGE_GLOBS],
+        'outputs': [],
+        'deps': ['station-pages', 'line-pages', 'melody-pages', 'listings'],
+    },
+    # The stages below rewrite pages in place, in this fixed order
+    'images': {
+        'command': [sys.executable, 'image_optimizer.py'],
+        'inputs': ['image_optimizer.py', 'logo.png', 'images/*.png', 'images/*.jpg', *PAGE_GLOBS],
+        'outputs': ['images/optimized/manifest.json'],
+        'deps': ['headers'],
+    },
+    'critical-css': {
+        'command': [sys.executable, 'critical_css.py'],
+        'inputs': ['critical_css.py', 'index.css', *PAGE_GLOBS],
+        'outputs': ['critical_css_cache.json'],
+        'deps': ['images'],
+    },
+    'resource-hints': {
+        'command': [sys.executable, 'resource_hints.py'],
+        'inputs': ['resource_hints.py', 'play_counts.json', 'audio/*.mp3', *PAGE_GLOBS],
+        'outputs': [],
+        'deps': ['critical-css'],
+    },
+    'fingerprint': {
+        'command': [sys.executable, 'asset_fingerprint.py'],
+        'inputs': ['asset_fingerprint.py', 'index.css', '*.js', 'logo.png',
+                   'images/*.*', 'images/optimized/*.*', 'audio/*.mp3', *PAGE_GLOBS],
+        'outputs': ['assets/manifest.json'],
+        'deps': ['resource-hints'],
+    },
+    'sitemap': {
+        'command': [sys.executable, 'sitemap.py'],
+        'inputs': ['sitemap.py', *PAGE_GLOBS],
+        'outputs': ['sitemap.xml', 'sitemap_manifest.json'],
+        'deps': ['fingerprint'],
+    },
+}
+
+
+def expand(patterns: List[str]) -> List[str]:
+    """Expand globs to a sorted list of files, skipping vendored folders."""
+    files = set()
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            if os.path.isfile(path) and not path.startswith(('node_modules', '.')):
+                files.add(path)
+    return sorted(files)
+
+
+def input_digest(stage: Dict, hasher: FileHasher) -> str:
+    h = hashlib.sha256(json.dumps(stage['command'][1:]).encode('utf-8'))
+    for path in expand(stage['inputs']):
+        h.update(path.encode('utf-8'))
+        h.update(hasher.digest(path).encode('ascii'))
+    return h.hexdigest()
+
+
+def outputs_present(stage: Dict) -> bool:
+    return all(glob.glob(pattern) for pattern in stage['outputs'])
+
+
+def load_cache() -> Dict:
+    if CACHE_FILE.exists():
+        try:
+            with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            pass
+    return {'files': {}, 'stages': {}}
+
+
+def save_cache(cache: Dict):
+    with open(CACHE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+
+
+def select_stages(targets: List[str]) -> List[str]:
+    """Return the targets and all their dependencies in declaration order."""
+    if not targets:
+        return list(STAGES)
+    wanted = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in STAGES:
+            raise ValueError(f"Unknown stage: {name}. Must be one of: {list(STAGES)}")
+        if name not in wanted:
+            wanted.add(name)
+            stack.extend(STAGES[name]['deps'])
+    return [name for name in STAGES if name in wanted]
+
+
+def run_stage(name: str) -> float:
+    """Run one stage's command and return its duration in seconds."""
+    stage = STAGES[name]
+    start = time.perf_counter()
+    if stage.get('stdout'):
+        with open(stage['stdout'], 'w', encoding='utf-8') as out:
+            result = subprocess.run(stage['command'], stdout=out, stderr=subprocess.PIPE, text=True)
+        output = result.stderr
+    else:
+        result = subprocess.run(stage['command'], capture_output=True, text=True)
+        output = result.stdout + result.stderr
+    if result.returncode != 0:
+        raise RuntimeError(f"stage {name} failed (exit {result.returncode}):\n{output[-2000:]}")
+    return time.perf_counter() - start
+
+
+def build(targets: List[str], force: bool = False, dry_run: bool = False,
+          workers: Optional[int] = None) -> Dict[str, Dict]:
+    """Run the selected stages in dependency order; return per-stage results."""
+    names = select_stages(targets)
+    cache = load_cache()
+    hasher = FileHasher(cache['files'])
+    results = {}
+    pending = set(names)
+    running = {}
+
+    def ready(name):
+        return all(dep in results or dep not in names for dep in STAGES[name]['deps'])
+
+    def start_ready(pool):
+        for name in [n for n in names if n in pending and ready(n)]:
+            pending.discard(name)
+            stage = STAGES[name]
+            # In a dry run upstream outputs are not rebuilt, so assume they would change
+            upstream_ran = dry_run and any(results.get(dep, {}).get('ran') for dep in stage['deps'])
+            digest = input_digest(stage, hasher)
+            if not force and not upstream_ran and cache['stages'].get(name) == digest and outputs_present(stage):
+                results[name] = {'ran': False, 'seconds': 0.0}
+                print(f"  ✓ {name}: up to date")
+                continue
+            if dry_run:
+                results[name] = {'ran': True, 'seconds': 0.0}
+                print(f"  → {name}: would run {' '.join(stage['command'])}")
+                continue
+            print(f"  ▶ {name}: {' '.join(stage['command'])}")
+            running[pool.submit(run_stage, name)] = name
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        start_ready(pool)
+        # Cached stages can unblock others without anything running, so loop until stable
+        while pending or running:
+            if not running:
+                before = len(pending)
+                start_ready(pool)
+                if len(pending) == before and not running:
+                    break
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    seconds = future.result()
+                except RuntimeError:
+                    save_cache(cache)
+                    raise
+                results[name] = {'ran': True, 'seconds': seconds}
+                # Record inputs as they are after the run (some stages edit pages in place)
+                cache['stages'][name] = input_digest(STAGES[name], hasher)
+                print(f"  ✓ {name}: {seconds:.2f}s")
+            start_ready(pool)
+
+    if not dry_run:
+        # Pages rewritten in place by later stages are this build's output, not new input
+        for name in results:
+            cache['stages'][name] = input_digest(STAGES[name], hasher)
+        save_cache(cache)
+    return results
+
+
+def critical_path(results: Dict[str, Dict]) -> List[str]:
+    """Return the chain of stages that determined the total build time."""
+    finish, via = {}, {}
+    for name in STAGES:
+        if name not in results:
+            continue
+        deps = [d for d in STAGES[name]['deps'] if d in finish]
+        prev = max(deps, key=lambda d: finish[d], default=None)
+        finish[name] = results[name]['seconds'] + (finish[prev] if prev else 0.0)
+        via[name] = prev
+    if not finish:
+        return []
+    path, name = [], max(finish, key=finish.get)
+    while name:
+        path.append(name)
+        name = via[name]
+    return path[::-1]
+
+
+def print_report(results: Dict[str, Dict], wall: float):
+    path = critical_path(results)
+    ran = [n for n, r in results.items() if r['ran']]
+    print("\n" + "=" * 60)
+    print(f"Build finished in {wall:.2f}s ({len(ran)} ran, {len(results) - len(ran)} cached)")
+    if ran and path:
+        total = sum(results[n]['seconds'] for n in path)
+        print(f"Critical path ({total:.2f}s): " + ' → '.join(
+            f"{n} {results[n]['seconds']:.2f}s" for n in path))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Build the site as a cached stage graph')
+    parser.add_argument('targets', nargs='*', help='Stages to build (default: all)')
+    parser.add_argument('--force', action='store_true', help='Ignore the cache')
+    parser.add_argument('--dry-run', action='store_true', help='Only show what would run')
+    parser.add_argument('--list', action='store_true', help='List stages and dependencies')
+    parser.add_argument('--jobs', type=int, help='Parallel stages (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, stage in STAGES.items():
+            deps = ', '.join(stage['deps']) or '-'
+            print(f"{name:18} deps: {deps}")
+        return
+
+    start = time.perf_counter()
+    try:
+        results = build(args.targets, args.force, args.dry_run, args.jobs)
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    print_report(results, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Build Utils
+===========
+Helpers shared by the build stages: the site layout the Node page generators
+write (company folders and page names), the JSON manifests each stage keeps
+next to its output, and write-if-changed output so untouched files keep their
+mtime.
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Output folder used by generate_line_pages.js for each company
+COMPANY_FOLDERS = {
+    'JR東日本': 'jr-east',
+    '東京メトロ': 'tokyo-metro',
+    '都営地下鉄': 'toei',
+}
+
+UNKNOWN_MELODY = '__unknown__'
+
+
+def safe_name(name: str) -> str:
+    """File name for a station, line or melody, as generate_melody_pages.js sanitises it."""
+    return re.sub(r'/+', '_', name)
+
+
+def basename_no_ext(path: str) -> str:
+    return re.sub(r'\.[^.]+$', '', path.split('/')[-1])
+
+
+def station_page(station: str) -> str:
+    """Path of the page generate_station_pages.js writes for a station."""
+    return f"stations/{station}.html"
+
+
+def line_page(company: str, line: str) -> Optional[str]:
+    """Path of the page generate_line_pages.js writes for a line, if the company has a folder."""
+    folder = COMPANY_FOLDERS.get(company)
+    return f"{folder}/{line}.html" if folder else None
+
+
+def melody_key(row: Dict) -> str:
+    """The key generate_melody_pages.js groups a row under: its file, else its melody name."""
+    file, melody = (row.get('file') or '').strip(), (row.get('melody') or '').strip()
+    return file or melody or UNKNOWN_MELODY
+
+
+def melody_titles(rows: List[Dict]) -> Dict[str, str]:
+    """Return {melody key: page title} the way generate_melody_pages.js names its pages.
+
+    A file's page is named after the first row of that file with a melody name,
+    so rows of the same file with other names still land on that page.
+    """
+    titles = {}
+    for row in rows:
+        key = melody_key(row)
+        if key in titles and titles[key] is not None:
+            continue
+        melody = (row.get('melody') or '').strip()
+        if key == UNKNOWN_MELODY:
+            titles[key] = '未指定のメロディー'
+        elif re.search(r'\.[a-z0-9]{2,5}$', key, re.IGNORECASE):
+            # None until a row with a melody name turns up
+            titles[key] = melody or None
+        else:
+            titles[key] = key
+    return {key: title or basename_no_ext(key) for key, title in titles.items()}
+
+
+def melody_page(title: str) -> str:
+    """Path of the page generate_melody_pages.js writes for a melody title."""
+    return f"melodies/{safe_name(title)}.html"
+
+
+def load_manifest(path: Path, default=None):
+    """Return a stage's JSON manifest, or `default` ({} if omitted) when there is none yet."""
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {} if default is None else default
+
+
+def save_manifest(path: Path, manifest):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def write_if_changed(path: Path, content: str) -> bool:
+    """Write `content` unless the file already holds it; return whether it was written."""
+    path = Path(path)
+    if path.exists() and path.read_text(encoding='utf-8') == content:
+        return False
+    path.write_text(content, encoding='utf-8')
+    return True
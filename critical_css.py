@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Critical CSS
+============
+Inline the index.css rules a page needs to paint its first screen and load
+the full stylesheet asynchronously.
+
+index.css is parsed into rules (including rules nested in @media), and each
+selector is matched against the elements of the page's first screen: the
+<header> plus the first FOLD_ELEMENTS visible elements after it (hidden
+subtrees such as the closed mobile menu do not count). Everything below the
+fold is styled by the deferred stylesheet. Matching is conservative:
+pseudo-classes and :not() are ignored and ancestor parts of a selector only
+need to exist above the fold, so a first-screen rule is never dropped just
+because it cannot be proven to match. @keyframes are kept when a critical
+rule animates with them.
+
+The render-blocking <link rel="stylesheet" href="/index.css"> is replaced by a
+preload that swaps itself into a stylesheet, with a <noscript> fallback. Pages
+already pointing at the fingerprinted stylesheet are handled the same way.
+
+Matches are cached in critical_css_cache.json per page content hash, so
+re-running after one page changes only re-matches that page (a change to
+index.css or to the fold invalidates everything).
+
+Usage:
+    python critical_css.py                    # all pages
+    python critical_css.py stations/東京.html  # specific pages
+    python critical_css.py --restore          # undo: back to the plain <link>
+"""
+
+import argparse
+import hashlib
+import json
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from update_headers import find_html_files
+
+CSS_FILE = Path('index.css')
+CACHE_FILE = Path('critical_css_cache.json')
+
+# index.css, also under its asset_fingerprint.py name (/assets/index.<hash>.css)
+INDEX_CSS = r'/?(?:assets/)?index(?:\.[0-9a-f]{8})?\.css'
+STYLESHEET_LINK = re.compile(rf'<link rel="stylesheet" href="({INDEX_CSS})">')
+CRITICAL_BLOCK = re.compile(
+    r'<style data-critical>.*?</style>\n?'
+    rf'<link rel="preload" href="({INDEX_CSS})" as="style" onload="[^"]*">'
+    rf'<noscript><link rel="stylesheet" href="{INDEX_CSS}"></noscript>',
+    re.DOTALL,
+)
+
+# Selectors that always apply to a document
+ALWAYS = {'*', 'html', 'body', ':root'}
+
+# Elements after the <header> that count as the first screen
+FOLD_ELEMENTS = 25
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                 'source', 'track', 'wbr'}
+HIDDEN_ELEMENTS = {'template', 'noscript', 'dialog'}
+
+
+# ---------------------------------------------------------------------------
+# CSS parsing
+# ---------------------------------------------------------------------------
+
+def strip_comments(css: str) -> str:
+    return re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+
+
+def parse_blocks(css: str) -> List[Tuple[str, object]]:
+    """Split CSS into (prelude, body) pairs; bodies of @media are parsed recursively."""
+    blocks = []
+    i, n = 0, len(css)
+    while i < n:
+        brace = css.find('{', i)
+        semi = css.find(';', i)
+        if brace == -1:
+            break
+        if semi != -1 and semi < brace and css[i:semi].strip().startswith('@'):
+            # Statement at-rule such as @import; kept out of the critical set
+            i = semi + 1
+            continue
+        prelude = css[i:brace].strip()
+        depth, j = 1, brace + 1
+        while j < n and depth:
+            if css[j] == '{':
+                depth += 1
+            elif css[j] == '}':
+                depth -= 1
+            j += 1
+        body = css[brace + 1:j - 1]
+        if prelude.startswith('@media') or prelude.startswith('@supports'):
+            blocks.append((prelude, parse_blocks(body)))
+        else:
+            blocks.append((prelude, body.strip()))
+        i = j
+    return blocks
+
+
+def flatten_rules(blocks, media: Optional[str] = None) -> List[Dict]:
+    """Return a flat, ordered list of rules with their enclosing @media."""
+    rules = []
+    for prelude, body in blocks:
+        if isinstance(body, list):
+            rules.extend(flatten_rules(body, prelude))
+        else:
+            rules.append({'media': media, 'prelude': prelude, 'body': body})
+    return rules
+
+
+def split_selectors(prelude: str) -> List[str]:
+    """Split a selector list on top-level commas."""
+    parts, depth, current = [], 0, []
+    for ch in prelude:
+        if ch in '([':
+            depth += 1
+        elif ch in ')]':
+            depth -= 1
+        if ch == ',' and depth == 0:
+            parts.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    parts.append(''.join(current).strip())
+    return [p for p in parts if p]
+
+
+COMPOUND_TOKEN = re.compile(r'([.#]?)(-?[_a-zA-Z][\w-]*)|\[\s*([\w-]+)[^\]]*\]|(\*)')
+
+
+def parse_compound(compound: str) -> Optional[Dict]:
+    """Parse a compound selector into its tag, classes, id and attribute names."""
+    # Drop pseudo-elements and pseudo-classes (with any arguments)
+    compound = re.sub(r'::?[\w-]+(\([^)]*\))?', '', compound)
+    parsed = {'tag': None, 'classes': set(), 'id': None, 'attrs': set()}
+    for prefix, name, attr, star in COMPOUND_TOKEN.findall(compound):
+        if attr:
+            parsed['attrs'].add(attr.lower())
+        elif star:
+            continue
+        elif prefix == '.':
+            parsed['classes'].add(name)
+        elif prefix == '#':
+            parsed['id'] = name
+        else:
+            parsed['tag'] = name.lower()
+    return parsed
+
+
+def compile_selector(selector: str) -> List[Dict]:
+    """Return the compounds of a selector, rightmost last."""
+    compounds = re.split(r'\s*[>+~]\s*|\s+', selector.strip())
+    return [parse_compound(c) for c in compounds if c]
+
+
+# ---------------------------------------------------------------------------
+# DOM features
+# ---------------------------------------------------------------------------
+
+def is_hidden(tag: str, attrs: Dict[str, Optional[str]]) -> bool:
+    """Whether an element (and its subtree) is not rendered on first paint."""
+    style = (attrs.get('style') or '').replace(' ', '').lower()
+    return (tag in HIDDEN_ELEMENTS or 'hidden' in attrs or attrs.get('aria-hidden') == 'true'
+            or 'display:none' in style)
+
+
+class ElementCollector(HTMLParser):
+    """Collect the (tag, classes, id, attribute names) signatures of a page's first screen."""
+
+    def __init__(self, fold: int = FOLD_ELEMENTS):
+        super().__init__(convert_charrefs=True)
+        self.signatures = set()
+        self.fold = fold
+        self.counted = 0
+        self.stack: List[str] = []
+        self.in_body = False
+        # Stack depth of the open <header>, 'done' once it is closed
+        self.header = None
+        self.hidden_depth: Optional[int] = None
+
+    def handle_starttag(self, tag, attrs):
+        tag = tag.lower()
+        attrs = dict(attrs)
+        depth = len(self.stack)
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(tag)
+        if self.hidden_depth is not None:
+            return
+        if is_hidden(tag, attrs):
+            if tag not in VOID_ELEMENTS:
+                self.hidden_depth = depth
+            return
+        if tag == 'body':
+            self.in_body = True
+        elif tag == 'header' and self.header is None:
+            self.header = depth
+        elif (self.in_body and self.header is None) or self.header == 'done':
+            # The header is always above the fold; other body elements count towards it
+            if self.counted >= self.fold:
+                return
+            self.counted += 1
+        classes = frozenset((attrs.get('class') or '').split())
+        self.signatures.add((tag, classes, attrs.get('id'), frozenset(attrs)))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag.lower() not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        tag = tag.lower()
+        if tag not in self.stack:
+            return
+        while self.stack.pop() != tag:
+            pass
+        if self.hidden_depth is not None and len(self.stack) <= self.hidden_depth:
+            self.hidden_depth = None
+        if isinstance(self.header, int) and len(self.stack) <= self.header:
+            self.header = 'done'
+
+
+def page_signatures(content: str, fold: int = FOLD_ELEMENTS) -> Set[tuple]:
+    collector = ElementCollector(fold)
+    collector.feed(content)
+    return collector.signatures
+
+
+def compound_matches(compound: Dict, signature: tuple) -> bool:
+    tag, classes, element_id, attrs = signature
+    if compound['tag'] and compound['tag'] != tag:
+        return False
+    if compound['id'] and compound['id'] != element_id:
+        return False
+    return compound['classes'] <= classes and compound['attrs'] <= attrs
+
+
+def selector_may_match(compounds: List[Dict], signatures: Set[tuple]) -> bool:
+    """Conservatively decide whether a selector can match anything on the page."""
+    for compound in compounds:
+        if not any(compound_matches(compound, s) for s in signatures):
+            return False
+    return True
+
+
+def match_rules(rules: List[Dict], compiled: List[List[List[Dict]]], content: str) -> List[int]:
+    """Return the indices of the rules a page needs."""
+    signatures = page_signatures(content)
+    matched = []
+    for index, (rule, selectors) in enumerate(zip(rules, compiled)):
+        if rule['media'] == '@media print' or rule['prelude'].startswith('@font-face'):
+            continue
+        if rule['prelude'].startswith('@keyframes'):
+            continue
+        if any(sel in ALWAYS or selector_may_match(comp, signatures)
+               for sel, comp in zip(split_selectors(rule['prelude']), selectors)):
+            matched.append(index)
+    return matched
+
+
+def keyframes_for(rules: List[Dict], matched: List[int]) -> List[int]:
+    """Return the @keyframes rules used by the matched rules."""
+    used = ' '.join(rules[i]['body'] for i in matched)
+    return [i for i, rule in enumerate(rules)
+            if rule['prelude'].startswith('@keyframes')
+            and re.search(r'\b' + re.escape(rule['prelude'].split()[-1]) + r'\b', used)]
+
+
+def render_css(rules: List[Dict], indices: List[int]) -> str:
+    """Render the selected rules in source order, grouping consecutive @media rules."""
+    out, open_media = [], None
+    for index in sorted(indices):
+        rule = rules[index]
+        if rule['media'] != open_media:
+            if open_media:
+                out.append('}')
+            if rule['media']:
+                out.append(rule['media'] + '{')
+            open_media = rule['media']
+        if rule['prelude'].startswith('@keyframes'):
+            body = re.sub(r'\s+', ' ', rule['body'])
+        else:
+            body = re.sub(r'\s*\n\s*', '', rule['body'])
+        prelude = re.sub(r'\s+', ' ', rule['prelude'])
+        out.append(f"{prelude}{{{body}}}")
+    if open_media:
+        out.append('}')
+    return ''.join(out)
+
+
+# ---------------------------------------------------------------------------
+# Pages
+# ---------------------------------------------------------------------------
+
+def restore_link(content: str) -> str:
+    """Undo a previous run: put back the plain render-blocking <link>."""
+    return CRITICAL_BLOCK.sub(lambda m: f'<link rel="stylesheet" href="{m.group(1)}">', content)
+
+
+def inject_critical(content: str, css: str) -> str:
+    """Swap the stylesheet <link> for inline critical CSS plus an async preload."""
+    def replace(match):
+        href = match.group(1)
+        return (f'<style data-critical>{css}</style>\n'
+                f'<link rel="preload" href="{href}" as="style" '
+                f'onload="this.onload=null;this.rel=\'stylesheet\'">'
+                f'<noscript><link rel="stylesheet" href="{href}"></noscript>')
+    return STYLESHEET_LINK.sub(replace, content, count=1)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def load_cache(css_hash: str) -> Dict:
+    if CACHE_FILE.exists():
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('css') == css_hash and cache.get('fold') == FOLD_ELEMENTS:
+            return cache
+    return {'css': css_hash, 'fold': FOLD_ELEMENTS, 'pages': {}}
+
+
+def process_pages(pages: List[str], restore: bool = False) -> Dict:
+    css_text = CSS_FILE.read_text(encoding='utf-8')
+    css_hash = content_hash(css_text)
+    rules = flatten_rules(parse_blocks(strip_comments(css_text)))
+    compiled = [[compile_selector(sel) for sel in split_selectors(rule['prelude'])]
+                if not rule['prelude'].startswith('@') else [] for rule in rules]
+    cache = load_cache(css_hash)
+
+    stats = {'pages': 0, 'matched': 0, 'cached': 0, 'written': 0}
+    for page in pages:
+        with open(page, 'r', encoding='utf-8') as f:
+            current = f.read()
+        original = restore_link(current)
+        if not STYLESHEET_LINK.search(original):
+            continue
+        stats['pages'] += 1
+
+        if restore:
+            updated = original
+        else:
+            page_hash = content_hash(original)
+            entry = cache['pages'].get(page)
+            if entry and entry['hash'] == page_hash:
+                indices = entry['rules']
+                stats['cached'] += 1
+            else:
+                matched = match_rules(rules, compiled, original)
+                indices = matched + keyframes_for(rules, matched)
+                cache['pages'][page] = {'hash': page_hash, 'rules': indices}
+                stats['matched'] += 1
+            updated = inject_critical(original, render_css(rules, indices))
+
+        if updated != current:
+            with open(page, 'w', encoding='utf-8') as f:
+                f.write(updated)
+            stats['written'] += 1
+
+    if not restore:
+        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False)
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Inline per-page critical CSS from index.css')
+    parser.add_argument('pages', nargs='*', help='Pages to process (default: all)')
+    parser.add_argument('--restore', action='store_true', help='Restore the plain stylesheet <link>')
+    args = parser.parse_args(argv)
+
+    pages = args.pages or find_html_files(include_index=True)
+    stats = process_pages(pages, args.restore)
+    print(f"🎨 {stats['pages']} pages: {stats['matched']} matched, {stats['cached']} cached, "
+          f"{stats['written']} written")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Data Shards
+===========
+Split stations.json into small per-station, per-line and per-melody JSON files
+so station, line and melody pages fetch only their own rows instead of the
+whole catalog.
+
+Output:
+    data/stations/<station>.json          rows of one station (all companies)
+    data/lines/<company folder>/<line>.json   rows of one line, in catalog order
+    data/melodies/<melody page>.json      rows a melody page lists
+    data/manifest.json                    shard path -> digest of its rows
+
+The shard paths mirror the page URLs (/stations/<station>.html,
+/<company folder>/<line>.html and /melodies/<melody>.html), so pages derive
+them from location.pathname and fall back to /stations.json when a shard is
+missing. Melody pages match rows by file name or (partial) melody name; their
+shards hold exactly the rows that match, using the page's own rule. Rows are
+indexed by file name and melody once, so each melody page only looks up its
+own title instead of scanning the catalog.
+
+The manifest digest of a shard is taken over the digests of its rows, so a
+shard is only serialized and rewritten when its rows change, and shards for
+removed stations or lines are deleted.
+
+Usage:
+    python data_shards.py
+    python data_shards.py --force
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from build_utils import (COMPANY_FOLDERS, basename_no_ext, load_manifest, melody_titles, safe_name, save_manifest,
+                         write_if_changed)
+
+OUTPUT_DIR = Path('data')
+MANIFEST_FILE = OUTPUT_DIR / 'manifest.json'
+
+
+def matches_melody_page(row: Dict, title: str, page: str) -> bool:
+    """The melody page's client-side filter (melody-template.html), in Python."""
+    file_name = basename_no_ext((row.get('file') or '').strip())
+    melody = (row.get('melody') or '').strip()
+    if file_name and title and file_name in (title, re.sub(r'\s+', '', title)):
+        return True
+    if melody and title and (melody == title or title in melody or melody in title):
+        return True
+    return bool(file_name and page and file_name in (page, basename_no_ext(page)))
+
+
+class RowIndex:
+    """Rows indexed by file name and melody, answering matches_melody_page for a whole page."""
+
+    def __init__(self, stations: List[Dict]):
+        self.by_file = defaultdict(list)
+        self.by_melody = defaultdict(list)
+        for i, row in enumerate(stations):
+            file_name = basename_no_ext((row.get('file') or '').strip())
+            melody = (row.get('melody') or '').strip()
+            if file_name:
+                self.by_file[file_name].append(i)
+            if melody:
+                self.by_melody[melody].append(i)
+        # Every melody on its own line, so a title (which has no newline) is found within one melody
+        self.melodies = list(self.by_melody)
+        self.starts, position = [], 0
+        for melody in self.melodies:
+            self.starts.append(position)
+            position += len(melody) + 1
+        self.text = '\n'.join(self.melodies)
+
+    def containing(self, title: str) -> List[str]:
+        """Return the melodies that contain `title`."""
+        found, start = [], 0
+        while True:
+            start = self.text.find(title, start)
+            if start == -1:
+                return found
+            index = bisect.bisect_right(self.starts, start) - 1
+            found.append(self.melodies[index])
+            # Continue after this melody; it is listed once however often it matches
+            start = self.starts[index] + len(self.melodies[index]) + 1
+
+    def matches(self, title: str, page: str) -> List[int]:
+        """Return the indices of the rows matches_melody_page accepts, in catalog order."""
+        rows = set()
+        if title:
+            for name in (title, re.sub(r'\s+', '', title)):
+                rows.update(self.by_file.get(name, ()))
+            melodies = set(self.containing(title)) if '\n' not in title else set()
+            # Melodies inside the title, looked up by every substring of it
+            melodies.update(title[i:j] for i in range(len(title)) for j in range(i + 1, len(title) + 1)
+                            if title[i:j] in self.by_melody)
+            for melody in melodies:
+                rows.update(self.by_melody[melody])
+        if page:
+            for name in (page, basename_no_ext(page)):
+                rows.update(self.by_file.get(name, ()))
+        return sorted(rows)
+
+
+def build_shards(stations: List[Dict]) -> Dict[str, List[int]]:
+    """Return {shard path: row indices} for every station, line and melody page."""
+    shards = {}
+    for i, row in enumerate(stations):
+        station_path = f"{OUTPUT_DIR}/stations/{safe_name(row['station'])}.json"
+        shards.setdefault(station_path, []).append(i)
+        folder = COMPANY_FOLDERS.get(row['company'], 'other')
+        line_path = f"{OUTPUT_DIR}/lines/{folder}/{safe_name(row['line'])}.json"
+        shards.setdefault(line_path, []).append(i)
+    index = RowIndex(stations)
+    for page, title in {safe_name(title): title for title in melody_titles(stations).values()}.items():
+        # Written even when empty, so the page does not fall back to the full catalog
+        shards[f"{OUTPUT_DIR}/melodies/{page}.json"] = index.matches(title.strip(), page)
+    return shards
+
+
+def serialize(rows: List[Dict]) -> str:
+    return json.dumps(rows, ensure_ascii=False, separators=(',', ':'))
+
+
+def write_shards(stations: List[Dict], force: bool = False) -> Dict:
+    """Write changed shards and the manifest; return counts."""
+    old_manifest = load_manifest(MANIFEST_FILE)
+    row_digests = [hashlib.sha256(serialize(row).encode('utf-8')).digest() for row in stations]
+    manifest = {}
+    written = 0
+    for path, rows in sorted(build_shards(stations).items()):
+        manifest[path] = hashlib.sha256(b''.join(row_digests[i] for i in rows)).hexdigest()
+        if force or old_manifest.get(path) != manifest[path] or not Path(path).exists():
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            if write_if_changed(path, serialize([stations[i] for i in rows])):
+                written += 1
+
+    removed = 0
+    for path in old_manifest:
+        if path not in manifest and Path(path).exists():
+            Path(path).unlink()
+            removed += 1
+
+    save_manifest(MANIFEST_FILE, manifest)
+    return {'shards': len(manifest), 'written': written, 'removed': removed}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Split stations.json into per-station, per-line and per-melody shards')
+    parser.add_argument('--force', action='store_true', help='Rewrite every shard')
+    args = parser.parse_args(argv)
+
+    with open('stations.json', 'r', encoding='utf-8') as f:
+        stations = json.load(f)
+    stats = write_shards(stations, args.force)
+    print(f"🧩 {stats['shards']} shards, {stats['written']} written, {stats['removed']} removed")
+
+
+if __name__ == '__main__':
+    main()
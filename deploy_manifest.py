@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Deploy Manifest
+===============
+Work out which files a deploy actually has to ship.
+
+The publishable tree is the repository minus everything that is not part of
+the site: vendored node_modules trees, dotfiles, the Python and Node build
+scripts, page templates, package files and the manifests/caches the build
+stages keep for themselves. Every publishable file is hashed in parallel
+(hashes cached by (size, mtime) in .deploy_cache.json) and compared against
+the manifest of the previous deploy, giving the added, modified and deleted
+files and the bytes that have to be transferred.
+
+The manifest is published with the site as /deploy-manifest.json, so the next
+deploy can diff against what is live (--previous accepts a path or a URL). A
+missing manifest means everything is new; so does one that cannot be fetched
+or read, with a warning, so a flaky fetch never blocks a deploy.
+
+Staging checks every static fetch('...') in the published pages and scripts
+against the tree and refuses to stage when one of them would 404, so state
+files that pages read (existing_melodies.txt, missing_melodies.txt) are never
+trimmed away by the exclusions.
+
+MP3s are not duplicated into assets/ (asset_fingerprint.py versions them in
+place), so the artifact carries the audio library once. The original images
+stay next to their optimized variants because scripts build their URLs
+(/images/${line}.png).
+
+Output:
+    --changes FILE   change set as JSON (added/modified/deleted with sizes)
+    --bundle FILE    .tar.gz of the added and modified files, the new
+                     deploy-manifest.json and deploy-changes.json (which also
+                     lists the deleted files), for hosts that take partial uploads
+    --stage DIR      the full publishable tree, hard-linked where possible,
+                     as the GitHub Pages artifact (Pages always replaces the
+                     whole site, so this trims the upload rather than diffing it)
+    --save           record this tree as deployed in ./deploy-manifest.json
+
+Usage:
+    python deploy_manifest.py                                   # summary only
+    python deploy_manifest.py --bundle deploy.tar.gz --save
+    python deploy_manifest.py --previous https://ekimero.com/deploy-manifest.json --stage _site
+"""
+
+import argparse
+import fnmatch
+import io
+import json
+import os
+import posixpath
+import re
+import shutil
+import sys
+import tarfile
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from file_hashes import FileHasher
+
+MANIFEST_NAME = 'deploy-manifest.json'
+CHANGES_NAME = 'deploy-changes.json'
+CACHE_FILE = Path('.deploy_cache.json')
+
+# Directories that are never published (dot-directories are skipped as well)
+EXCLUDED_DIRS = {'node_modules', 'node_modules1', '__pycache__', '_site'}
+
+# Files that are not part of the site, matched against the path from the root
+EXCLUDED_FILES = [
+    # Build scripts and tooling
+    '*.py', '*.pyc', 'package*.json', 'requests.jsonl', 'README.md',
+    'generate_*.js', 'jremelodies.js', 'stationcheck.js', 'updateDailyCounter.js',
+    # Page templates
+    'template.html', '*-template.html',
+    # State kept by the build stages
+    # (existing_melodies.txt and missing_melodies.txt stay: index.html and radio.html fetch them)
+    MANIFEST_NAME, 'updates_log.json', 'unused_melodies.json', 'melody_remap.json', 'page_budgets.json', 'sitemap_manifest.json',
+    'critical_css_cache.json', 'data/manifest.json', 'listings/manifest.json',
+    'assets/manifest.json', 'images/optimized/manifest.json', 'play_counts.json',
+]
+
+# fetch() calls whose whole URL is one string literal
+FETCH_URL = re.compile(r"""\bfetch\(\s*(['"])([^'"$]+)\1\s*[,)]""")
+EXTERNAL = re.compile(r'^(?:[a-z][a-z0-9+.-]*:|//)', re.IGNORECASE)
+
+
+def is_excluded(path: str) -> bool:
+    if posixpath.basename(path).startswith('.'):
+        return True
+    return any(fnmatch.fnmatchcase(path, pattern) for pattern in EXCLUDED_FILES)
+
+
+def find_publishable() -> List[str]:
+    """Return every file that belongs to the published site, as sorted posix paths."""
+    files = []
+    for root, dirs, names in os.walk('.'):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d not in EXCLUDED_DIRS]
+        for name in names:
+            path = posixpath.normpath(posixpath.join(root, name))
+            if not is_excluded(path):
+                files.append(path)
+    return sorted(files)
+
+
+def load_cache() -> Dict:
+    if CACHE_FILE.exists():
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def build_manifest(files: List[str], workers: Optional[int] = None) -> Dict[str, List]:
+    """Return {path: [size, sha256]} for the given files, hashed in parallel."""
+    cache = load_cache()
+    hasher = FileHasher(cache)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = list(pool.map(hasher.digest, files))
+    with open(CACHE_FILE, 'w', encoding='utf-8') as f:
+        json.dump({path: cache[path] for path in files}, f, ensure_ascii=False)
+    return {path: [cache[path][0], digest] for path, digest in zip(files, digests)}
+
+
+def load_previous(source: str) -> Optional[Dict[str, List]]:
+    """Load the previous deploy's manifest from a path or URL; None if there is none or it is unusable."""
+    try:
+        if source.startswith(('http://', 'https://')):
+            with urllib.request.urlopen(source, timeout=30) as response:
+                data = json.load(response)
+        else:
+            with open(source, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        files = data['files']
+        if not isinstance(files, dict):
+            raise ValueError('"files" is not an object')
+        return files
+    except FileNotFoundError:
+        return None
+    except urllib.error.HTTPError as e:
+        if e.code != 404:
+            print(f"⚠️  Could not fetch {source}: HTTP {e.code}")
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"⚠️  Could not load {source}: {e}")
+        return None
+
+
+def diff_manifests(old: Dict[str, List], new: Dict[str, List]) -> Dict[str, List[str]]:
+    """Split the new tree into added, modified, deleted and unchanged paths."""
+    changes = {'added': [], 'modified': [], 'deleted': sorted(set(old) - set(new)), 'unchanged': []}
+    for path, (_, digest) in new.items():
+        if path not in old:
+            changes['added'].append(path)
+        elif old[path][1] != digest:
+            changes['modified'].append(path)
+        else:
+            changes['unchanged'].append(path)
+    return changes
+
+
+def serialize_manifest(manifest: Dict[str, List]) -> bytes:
+    # One file per line keeps the published manifest diffable
+    lines = [f"{json.dumps(path, ensure_ascii=False)}: {json.dumps(entry)}" for path, entry in manifest.items()]
+    return ('{"version": 1, "files": {\n' + ',\n'.join(lines) + '\n}}\n').encode('utf-8')
+
+
+def changes_document(changes: Dict[str, List[str]], manifest: Dict[str, List]) -> Dict:
+    return {
+        'added': {path: manifest[path][0] for path in changes['added']},
+        'modified': {path: manifest[path][0] for path in changes['modified']},
+        'deleted': changes['deleted'],
+    }
+
+
+def write_bundle(target: str, changes: Dict[str, List[str]], manifest: Dict[str, List]):
+    """Write a .tar.gz with the changed files, the new manifest and the change set."""
+    extra = {
+        MANIFEST_NAME: serialize_manifest(manifest),
+        CHANGES_NAME: json.dumps(changes_document(changes, manifest), ensure_ascii=False, indent=2).encode('utf-8'),
+    }
+    with tarfile.open(target, 'w:gz') as tar:
+        for path in changes['added'] + changes['modified']:
+            tar.add(path, arcname=path, recursive=False)
+        for name, data in extra.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+def link_or_copy(source: str, target: Path):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def fetched_files(paths: List[str]) -> Dict[str, List[str]]:
+    """Return {site path: [files that fetch it]} for the static fetch() URLs of pages and scripts.
+
+    Relative URLs resolve against the page's folder; scripts are included from
+    pages at the site root, so theirs resolve against the root.
+    """
+    fetched = {}
+    for path in paths:
+        if not path.endswith(('.html', '.js')):
+            continue
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            content = f.read()
+        base = posixpath.dirname(path) if path.endswith('.html') else ''
+        for match in FETCH_URL.finditer(content):
+            url = re.split(r'[?#]', match.group(2), maxsplit=1)[0]
+            if not url or EXTERNAL.match(url):
+                continue
+            target = url.lstrip('/') if url.startswith('/') else posixpath.normpath(posixpath.join(base, url))
+            pages = fetched.setdefault(target, [])
+            if path not in pages:
+                pages.append(path)
+    return fetched
+
+
+def stage_tree(target: str, manifest: Dict[str, List], workers: Optional[int] = None):
+    """Recreate `target` as the full publishable tree plus deploy-manifest.json."""
+    missing = {path: pages for path, pages in fetched_files(list(manifest)).items() if path not in manifest}
+    if missing:
+        listed = '; '.join(f"{path} (fetched by {', '.join(pages[:3])})" for path, pages in sorted(missing.items()))
+        raise FileNotFoundError(f"pages fetch files that are not published: {listed}")
+    root = Path(target)
+    if root.exists():
+        shutil.rmtree(root)
+    root.mkdir(parents=True)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda path: link_or_copy(path, root / path), manifest))
+    (root / MANIFEST_NAME).write_bytes(serialize_manifest(manifest))
+
+
+def size_of(paths: List[str], manifest: Dict[str, List]) -> int:
+    return sum(manifest[path][0] for path in paths)
+
+
+def megabytes(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Diff the publishable tree against the last deploy')
+    parser.add_argument('--previous', default=MANIFEST_NAME,
+                        help=f'Manifest of the last deploy, path or URL (default: {MANIFEST_NAME})')
+    parser.add_argument('--changes', help='Write the change set as JSON')
+    parser.add_argument('--bundle', help='Write the changed files as a .tar.gz bundle')
+    parser.add_argument('--stage', help='Stage the full publishable tree into this directory')
+    parser.add_argument('--save', action='store_true', help=f'Record this tree as deployed in {MANIFEST_NAME}')
+    parser.add_argument('--verbose', '-v', action='store_true', help='List every changed file')
+    parser.add_argument('--workers', type=int, help='Hashing threads (default: CPU count + 4)')
+    args = parser.parse_args(argv)
+
+    manifest = build_manifest(find_publishable(), args.workers)
+    previous = load_previous(args.previous)
+    if previous is None:
+        print(f"ℹ️  No previous manifest at {args.previous}; treating every file as new")
+    changes = diff_manifests(previous or {}, manifest)
+
+    total = size_of(list(manifest), manifest)
+    transfer = size_of(changes['added'] + changes['modified'], manifest)
+    print(f"📦 {len(manifest)} publishable files ({megabytes(total)})")
+    print(f"   ➕ {len(changes['added'])} added ({megabytes(size_of(changes['added'], manifest))})")
+    print(f"   ✏️  {len(changes['modified'])} modified ({megabytes(size_of(changes['modified'], manifest))})")
+    print(f"   ➖ {len(changes['deleted'])} deleted")
+    print(f"   💤 {len(changes['unchanged'])} unchanged")
+    share = transfer / total * 100 if total else 0
+    print(f"🚚 Transfer: {megabytes(transfer)} ({share:.1f}% of a full upload)")
+    if args.verbose:
+        for kind, mark in (('added', '+'), ('modified', '~'), ('deleted', '-')):
+            for path in changes[kind]:
+                print(f"  {mark} {path}")
+
+    if args.changes:
+        with open(args.changes, 'w', encoding='utf-8') as f:
+            json.dump(changes_document(changes, manifest), f, ensure_ascii=False, indent=2)
+        print(f"📝 Change set written to {args.changes}")
+    if args.bundle:
+        write_bundle(args.bundle, changes, manifest)
+        print(f"🗜️  Bundle written to {args.bundle} ({megabytes(os.path.getsize(args.bundle))})")
+    if args.stage:
+        stage_tree(args.stage, manifest, args.workers)
+        print(f"📁 Staged {len(manifest)} files in {args.stage}")
+    if args.save:
+        Path(MANIFEST_NAME).write_bytes(serialize_manifest(manifest))
+        print(f"💾 Recorded as deployed in {MANIFEST_NAME}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except (OSError, json.JSONDecodeError, KeyError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
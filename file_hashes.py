@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+File Hashes
+===========
+SHA-256 content hashes cached by (size, mtime), shared by build.py,
+asset_fingerprint.py and deploy_manifest.py so unchanged files are only
+stat'ed. The cache is a plain {path: [size, mtime_ns, sha256]} dict that
+each tool keeps in its own JSON file.
+"""
+
+import hashlib
+import os
+from typing import Dict
+
+
+class FileHasher:
+    """Content hashes cached by (size, mtime) so unchanged files are only stat'ed."""
+
+    def __init__(self, cache: Dict):
+        self.cache = cache
+
+    def digest(self, path: str) -> str:
+        st = os.stat(path)
+        cached = self.cache.get(path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                h.update(chunk)
+        self.cache[path] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        return self.cache[path][2]
@@ -30,6 +30,7 @@ function escapeHtml(str) {
 melodiesMap.forEach((entries, key) => {
   let melodyName = '';
   let audioSrc = '';
+  let previewSrc = '';
 
   if (key === '__unknown__') {
     melodyName = '未指定のメロディー';
@@ -37,6 +38,9 @@ melodiesMap.forEach((entries, key) => {
     const firstEntry = entries.find(e => e.melody && e.melody.trim());
     melodyName = firstEntry ? firstEntry.melody.trim() : path.basename(key).replace(/\.[^.]+$/, '');
     audioSrc = key.startsWith('/') ? key : `/${key}`;
+    // Start on the fast-start clip from preview_clips.py; the page script moves to the full file
+    const withPreview = entries.find(e => e.preview);
+    if (withPreview) previewSrc = withPreview.preview.startsWith('/') ? withPreview.preview : `/${withPreview.preview}`;
   } else {
     melodyName = key;
   }
@@ -48,7 +52,7 @@ melodiesMap.forEach((entries, key) => {
   ).join('');
 
   // audio block
-  const audioBlock = audioSrc ? `<div style="margin-top:12px; display:flex; gap:8px; align-items:center; justify-content:center;"><audio id="melodyAudio" controls controlsList="nodownload" src="${escapeHtml(audioSrc)}" style="width:100%;max-width:420px;"></audio><label style="font-size:0.95em;color:#fff;"><input id="melodyLoop" type="checkbox" style="margin-left:6px;"> ループ</label></div>` : '<div style="color:#888; margin-top:12px;">音源なし</div>';
+  const audioBlock = audioSrc ? `<div style="margin-top:12px; display:flex; gap:8px; align-items:center; justify-content:center;"><audio id="melodyAudio" controls controlsList="nodownload" src="${escapeHtml(previewSrc || audioSrc)}"${previewSrc ? ` data-full="${escapeHtml(audioSrc)}"` : ''} style="width:100%;max-width:420px;"></audio><label style="font-size:0.95em;color:#fff;"><input id="melodyLoop" type="checkbox" style="margin-left:6px;"> ループ</label></div>` : '<div style="color:#888; margin-top:12px;">音源なし</div>';
 
   // Group by company then by line
   const companies = [
@@ -124,10 +128,13 @@ melodiesMap.forEach((entries, key) => {
     `<div id="station-line-logos" style="margin-bottom:16px; display:flex; gap:8px; justify-content:center; flex-wrap:wrap;">${lineLogosHTML}</div>`
   );
 
-  // Set background image from a random line (if we have lines)
+  // Set background image from one of the lines (if we have lines), picked by a hash of the
+  // melody name so regenerating an unchanged page gives the same page
   if (uniqueLines.length > 0) {
-    const randomLine = uniqueLines[Math.floor(Math.random() * uniqueLines.length)];
-    const bgImageUrl = `url("/images/${escapeHtml(randomLine)}.jpg")`;
+    let hash = 0;
+    for (const ch of melodyName) hash = (hash * 31 + ch.codePointAt(0)) >>> 0;
+    const bgLine = uniqueLines[hash % uniqueLines.length];
+    const bgImageUrl = `url("/images/${escapeHtml(bgLine)}.jpg")`;
     // Set the CSS custom property on the melody-header div
     outHtml = outHtml.replace(
       /(<div class="station-header melody-header"[^>]*)(>)/,
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Image Optimizer
+===============
+Resize logo.png and the line logos under images/ to the sizes the pages
+actually display them at, and rewrite <img> tags to responsive <picture>
+markup.
+
+Display sizes are read from the pages themselves (the .logo, .hero-logo and
+.footer-icon classes and inline height/width styles; a max-height/max-width
+only caps the natural size). For every size a 1x and 2x variant is
+written as lossless-optimized PNG and lossless WebP into images/optimized/,
+and each <picture> lists just the two WebPs with density descriptors (the
+<img> fallback is the 1x PNG), which keeps the markup that update_headers.py
+repeats on every page small.
+Sources are cached by content hash in images/optimized/manifest.json, so only
+changed images are re-encoded.
+
+update_headers.py renders NEW_HEADER through rewrite_images(), so the
+optimized logo survives a headers run; build.py runs this stage after it.
+The stage is idempotent over its own output and over asset_fingerprint.py's:
+<img> tags already inside a <picture> are left alone, and so are hashed
+/assets/... sources: this stage runs first, so an image that still carries a
+hashed name was passed over on purpose.
+
+Usage:
+    python image_optimizer.py                 # optimize and rewrite all pages
+    python image_optimizer.py --dry-run       # report sizes without writing
+    python image_optimizer.py --no-rewrite    # only (re)build the variants
+
+Requires Pillow (pip install Pillow).
+"""
+
+import argparse
+import hashlib
+import html
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from asset_fingerprint import HASHED, unhash
+from build_utils import load_manifest, save_manifest
+from update_headers import find_html_files, rewrite_file
+
+OUTPUT_DIR = Path('images/optimized')
+MANIFEST_FILE = OUTPUT_DIR / 'manifest.json'
+
+# CSS classes from index.css that fix an image's rendered height
+CLASS_HEIGHTS = {
+    'logo': 40,
+    'hero-logo': 180,
+    'footer-icon': 40,
+}
+
+DENSITIES = (1, 2)
+OPTIMIZABLE = ('.png', '.jpg', '.jpeg')
+
+# A whole <picture> is matched first so the <img> inside it is never wrapped again
+IMG_OR_PICTURE = re.compile(r'<picture\b.*?</picture>|<img\b[^>]*>', re.IGNORECASE | re.DOTALL)
+ASSET_REF = re.compile(r'/(assets/[^"\s,]+)')
+IMG_TAG = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+ATTR = re.compile(r'([\w-]+)\s*=\s*"([^"]*)"')
+STYLE_SIZE = re.compile(r'(?<![\w-])(max-)?(height|width)\s*:\s*(\d+)px', re.IGNORECASE)
+
+
+def file_hash(path: Path) -> str:
+    """Return the SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_attrs(tag: str) -> Dict[str, str]:
+    """Return the double-quoted attributes of a tag."""
+    return {name.lower(): value for name, value in ATTR.findall(tag)}
+
+
+def display_size(attrs: Dict[str, str]) -> Optional[tuple]:
+    """Return ('height'|'width', css_px, is_max) for an <img>, or None if unconstrained.
+
+    is_max is True when the size comes from max-height/max-width, which only
+    caps the natural size of the image.
+    """
+    for cls in attrs.get('class', '').split():
+        if cls in CLASS_HEIGHTS:
+            return ('height', CLASS_HEIGHTS[cls], False)
+    sizes = {}
+    for is_max, dimension, value in STYLE_SIZE.findall(attrs.get('style', '')):
+        # A fixed size wins over a max- size given for the same dimension
+        if dimension.lower() not in sizes or sizes[dimension.lower()][1]:
+            sizes[dimension.lower()] = (int(value), bool(is_max))
+    for dimension in ('height', 'width'):
+        if dimension in sizes:
+            return (dimension, *sizes[dimension])
+    return None
+
+
+def img_tags(content: str) -> List[str]:
+    """Return the <img> tags of a page that are not already inside a <picture>."""
+    return [match.group(0) for match in IMG_OR_PICTURE.finditer(content) if match.group(0)[1:4].lower() == 'img']
+
+
+def local_source(src: str) -> Optional[Path]:
+    """Map an <img src> to a local optimizable file, if it is one (never a variant or hashed copy)."""
+    if not src.startswith('/') or '${' in src or src.startswith('/images/optimized/') or HASHED.match(src[1:]):
+        return None
+    path = Path(src.lstrip('/'))
+    if path.suffix.lower() not in OPTIMIZABLE or not path.is_file():
+        return None
+    return path
+
+
+def collect_usages(pages: List[str]) -> Dict[str, Set[tuple]]:
+    """Scan pages for the display sizes of every local image."""
+    usages: Dict[str, Set[tuple]] = {}
+    for page in pages:
+        with open(page, 'r', encoding='utf-8') as f:
+            content = f.read()
+        for tag in img_tags(content):
+            attrs = parse_attrs(tag)
+            src = html.unescape(attrs.get('src', ''))
+            size = display_size(attrs)
+            if size and local_source(src):
+                usages.setdefault(src, set()).add(size[:2])
+    return usages
+
+
+def variant_name(source: Path, width: int, ext: str) -> str:
+    """Return the output path of a variant, keeping the source's folder layout."""
+    stem = str(source.with_suffix('')).replace('/', '__')
+    return str(OUTPUT_DIR / f"{stem}-{width}w{ext}")
+
+
+def build_variants(job: Dict) -> Dict:
+    """Encode all variants of one source image (runs in a worker process)."""
+    from PIL import Image
+
+    source = Path(job['source'])
+    with Image.open(source) as img:
+        img.load()
+        width, height = img.size
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA')
+
+        targets = set()
+        for dimension, css_px in job['sizes']:
+            for density in DENSITIES:
+                px = css_px * density
+                w = px if dimension == 'width' else round(px * width / height)
+                targets.add(min(w, width))
+
+        variants = []
+        for w in sorted(targets):
+            h = max(1, round(w * height / width))
+            resized = img if w == width else img.resize((w, h), Image.LANCZOS)
+            png_path = variant_name(source, w, '.png')
+            webp_path = variant_name(source, w, '.webp')
+            resized.save(png_path, 'PNG', optimize=True)
+            resized.save(webp_path, 'WEBP', lossless=True, method=6)
+            variants.append({'width': w, 'height': h, 'png': png_path, 'webp': webp_path})
+
+    return {
+        'source': str(source),
+        'hash': job['hash'],
+        'width': width,
+        'height': height,
+        'sizes': sorted(job['sizes']),
+        'variants': variants,
+    }
+
+
+def optimize_images(usages: Dict[str, Set[tuple]], workers: Optional[int] = None) -> Dict:
+    """Build variants for new or changed sources and return the manifest."""
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(MANIFEST_FILE)
+
+    jobs = []
+    for src, sizes in sorted(usages.items()):
+        source = local_source(src)
+        digest = file_hash(source)
+        cached = manifest.get(src)
+        if cached and cached['hash'] == digest and set(map(tuple, cached['sizes'])) >= sizes:
+            continue
+        jobs.append({'src': src, 'source': str(source), 'hash': digest, 'sizes': sorted(sizes)})
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for job, entry in zip(jobs, pool.map(build_variants, jobs)):
+                manifest[job['src']] = entry
+                saved = Path(job['source']).stat().st_size
+                smallest = min(Path(v['webp']).stat().st_size for v in entry['variants'])
+                print(f"  ✓ {job['src']}: {len(entry['variants'])} sizes "
+                      f"({saved:,} → {smallest:,} bytes smallest WebP)")
+        save_manifest(MANIFEST_FILE, manifest)
+
+    print(f"🖼️  {len(jobs)} images encoded, {len(usages) - len(jobs)} cached")
+    return manifest
+
+
+def picture_markup(tag: str, entry: Dict) -> str:
+    """Return the <picture> replacement for one <img> tag."""
+    attrs = parse_attrs(tag)
+    dimension, css_px, is_max = display_size(attrs)
+    if is_max:
+        css_px = min(css_px, entry[dimension])
+    if dimension == 'height':
+        css_w = round(css_px * entry['width'] / entry['height'])
+        css_h = css_px
+    else:
+        css_w = css_px
+        css_h = round(css_px * entry['height'] / entry['width'])
+
+    # The display size is fixed, so density descriptors pick the variant; no sizes needed
+    variants = entry['variants']
+    one, two = (min((v for v in variants if v['width'] >= px), key=lambda v: v['width'], default=variants[-1])
+                for px in (css_w, css_w * 2))
+    webp_srcset = f"/{one['webp']}" + (f", /{two['webp']} 2x" if two is not one else '')
+
+    img = re.sub(r'\ssrc="[^"]*"', f' src="/{one["png"]}"', tag, count=1)
+    img = re.sub(r'\s(width|height|srcset|sizes)="[^"]*"', '', img)
+    # Browsers without WebP get the 1x PNG only
+    extra = f' width="{css_w}" height="{css_h}"'
+    img = re.sub(r'\s*/?>$', extra + '>', img)
+    return f'<picture><source type="image/webp" srcset="{webp_srcset}">{img}</picture>'
+
+
+def plain_refs(markup: str) -> str:
+    """Return markup with asset_fingerprint.py's hashed /assets/ paths put back to their sources."""
+    return ASSET_REF.sub(lambda m: '/' + unhash(m.group(1)), markup)
+
+
+def original_img(picture: str, sources: Dict[str, str]) -> Optional[str]:
+    """Return the <img> a <picture> of ours replaced, or None if it is not one."""
+    img = IMG_TAG.search(picture)
+    src = parse_attrs(img.group(0)).get('src', '') if img else ''
+    if plain_refs(src) not in sources:
+        return None
+    return re.sub(r'\ssrc="[^"]*"', f' src="{sources[plain_refs(src)]}"', img.group(0), count=1)
+
+
+def rewrite_images(content: str, manifest: Dict) -> str:
+    """Replace the optimizable <img> tags in content with <picture> markup in a single pass.
+
+    A <picture> written earlier is rendered again from the <img> it replaced and
+    only replaced when the markup differs once hashed names are put back, so
+    fingerprinted output stays as it is until the markup itself changes.
+    """
+    sources = {f"/{v['png']}": src for src, entry in manifest.items() for v in entry['variants']}
+
+    def replace(match):
+        tag = match.group(0)
+        original = tag if tag[1:4].lower() == 'img' else original_img(tag, sources)
+        if original is None:
+            return tag
+        attrs = parse_attrs(original)
+        entry = manifest.get(html.unescape(attrs.get('src', '')))
+        if not entry or not display_size(attrs):
+            return tag
+        markup = picture_markup(original, entry)
+        return tag if plain_refs(tag) == markup else markup
+
+    return IMG_OR_PICTURE.sub(replace, content)
+
+
+def rewrite_page(page: str, manifest: Dict) -> bool:
+    """Rewrite the optimizable <img> tags of one page."""
+    return rewrite_file(page, lambda content: rewrite_images(content, manifest))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Optimize site images and rewrite <img> tags')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be optimized')
+    parser.add_argument('--no-rewrite', action='store_true', help='Do not rewrite HTML pages')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    pages = find_html_files(include_index=True)
+    usages = collect_usages(pages)
+    print(f"Found {len(usages)} images used at fixed sizes across {len(pages)} pages")
+
+    if args.dry_run:
+        for src, sizes in sorted(usages.items()):
+            size_list = ', '.join(f"{d}:{px}px" for d, px in sorted(sizes))
+            print(f"  {src} ({Path(src.lstrip('/')).stat().st_size:,} bytes): {size_list}")
+        return
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("❌ Error: Pillow is required (pip install Pillow)")
+        raise SystemExit(1)
+
+    manifest = optimize_images(usages, args.workers)
+
+    if not args.no_rewrite:
+        rewritten = sum(rewrite_page(page, manifest) for page in pages)
+        print(f"📝 Rewrote <img> tags in {rewritten} pages")
+
+
+if __name__ == '__main__':
+    main()
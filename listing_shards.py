@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Listing Shards
+==============
+Replace the monolithic all-pages.html and stations.html listings with small
+sharded pages and a lightweight index.
+
+- stations.html becomes an index of companies and lines; each line gets its own
+  shard under listings/<company folder>/<line>.html listing its stations.
+- all-pages.html becomes an index of directories; each directory is split into
+  shards of at most --shard-size pages under listings/pages/<dir>-<n>.html.
+
+Every shard's input rows are hashed into listings/manifest.json, and shards
+(and the two index pages) are only re-rendered when their rows change. Shards
+are rendered in parallel.
+
+Pages carry the shared header and mobile menu from update_headers.py, so a
+headers run leaves fresh shards as they are. Supersedes generate_all_pages.js
+and ssg.js, which are gone.
+
+Usage:
+    python listing_shards.py
+    python listing_shards.py --shard-size 100 --force
+"""
+
+import argparse
+import hashlib
+import html
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+from build_utils import COMPANY_FOLDERS, load_manifest, safe_name, save_manifest
+from update_headers import (MOBILE_MENU_HTML, MOBILE_MENU_SCRIPT, MOBILE_MENU_STYLES, find_html_files,
+                            header_markup)
+
+OUTPUT_DIR = Path('listings')
+MANIFEST_FILE = OUTPUT_DIR / 'manifest.json'
+STATIONS_INDEX = Path('stations.html')
+PAGES_INDEX = Path('all-pages.html')
+SHARD_SIZE = 150
+
+PAGE_TEMPLATE = '''<!doctype html>
+<html lang="ja">
+<head>
+  <meta charset="utf-8">
+  <meta name="viewport" content="width=device-width,initial-scale=1">
+  <title>{title} | どこでも駅メロ</title>
+  <link rel="stylesheet" href="/index.css">
+  <link rel="icon" href="/images/new-logo.png" type="image/png">
+  <style>
+    .listing {{ max-width:1100px; margin:18px auto; padding:0 18px; }}
+    .listing h1 {{ color:#1976d2; font-size:1.8em; margin:24px 0 8px; font-weight:800; text-align:center; }}
+    .listing .lead {{ color:#666; text-align:center; margin:0 0 20px; }}
+    .group-card {{ border:1px solid #e6e9ef; border-radius:12px; background:#fff; padding:16px; margin-bottom:18px; }}
+    .group-title {{ color:#1976d2; margin:0 0 12px; font-size:1.05em; }}
+    .pages-grid {{ display:grid; grid-template-columns:repeat(auto-fill,minmax(220px,1fr)); gap:10px; }}
+    .page-card {{ display:block; padding:10px 12px; border-radius:10px; background:#f7fbff; text-decoration:none; color:#1976d2; font-weight:700; }}
+    .page-meta {{ display:block; color:#666; font-size:0.88em; font-weight:400; }}
+  </style>
+</head>
+<body>
+{header}
+{menu_styles}
+{menu_html}
+
+  <main class="listing">
+    <h1>{title}</h1>
+    <p class="lead">{lead}</p>
+{body}
+  </main>
+{menu_script}
+</body>
+</html>
+'''
+
+
+def href(path: str) -> str:
+    """Return an encoded site-absolute link for a relative page path."""
+    return '/' + quote(path)
+
+
+def render_page(path: str, title: str, lead: str, groups: List[Dict]) -> str:
+    """Render the listing page at path from [{'title', 'items': [(href, name, meta)]}]."""
+    body = []
+    for group in groups:
+        body.append(f'    <div class="group-card">\n      <h3 class="group-title">{html.escape(group["title"])}</h3>\n'
+                    f'      <div class="pages-grid">')
+        for link, name, meta in group['items']:
+            meta_html = f'<span class="page-meta">{html.escape(meta)}</span>' if meta else ''
+            body.append(f'        <a class="page-card" href="{html.escape(link)}">{html.escape(name)}{meta_html}</a>')
+        body.append('      </div>\n    </div>')
+    return PAGE_TEMPLATE.format(title=html.escape(title), lead=html.escape(lead),
+                                header=header_markup(path).lstrip(), menu_styles=MOBILE_MENU_STYLES,
+                                menu_html=MOBILE_MENU_HTML, menu_script=MOBILE_MENU_SCRIPT,
+                                body='\n'.join(body))
+
+
+def station_shards(stations: List[Dict]) -> Dict[str, Dict]:
+    """Group stations.json rows into one shard per (company, line)."""
+    shards = {}
+    for row in stations:
+        folder = COMPANY_FOLDERS.get(row['company'], 'other')
+        path = f"{OUTPUT_DIR}/{folder}/{safe_name(row['line'])}.html"
+        shard = shards.setdefault(path, {'company': row['company'], 'line': row['line'], 'rows': []})
+        shard['rows'].append([row['station'], row.get('melody', '')])
+    return shards
+
+
+def render_station_shard(path: str, shard: Dict) -> str:
+    """Render the station list of one line, in stations.json order."""
+    stations = {}
+    for station, melody in shard['rows']:
+        stations.setdefault(station, []).append(melody)
+    items = [(href(f"stations/{safe_name(station)}.html"), station, f"{len(melodies)}メロディー")
+             for station, melodies in stations.items()]
+    return render_page(path, f"{shard['line']}の駅一覧", shard['company'],
+                       [{'title': shard['line'], 'items': items}])
+
+
+def page_shards(pages: List[str], shard_size: int) -> Dict[str, Dict]:
+    """Split the site's pages into per-directory shards of at most shard_size."""
+    by_dir = {}
+    for page in pages:
+        if Path(page).parts[0] == OUTPUT_DIR.name:
+            continue
+        directory = str(Path(page).parent)
+        by_dir.setdefault(directory, []).append(page)
+
+    shards = {}
+    for directory, dir_pages in sorted(by_dir.items()):
+        label = 'root' if directory == '.' else directory.replace('/', '_')
+        for number, start in enumerate(range(0, len(dir_pages), shard_size)):
+            rows = dir_pages[start:start + shard_size]
+            path = f"{OUTPUT_DIR}/pages/{label}-{number + 1}.html"
+            shards[path] = {'directory': directory, 'rows': rows}
+    return shards
+
+
+def render_pages_shard(path: str, shard: Dict) -> str:
+    directory = '/' if shard['directory'] == '.' else f"/{shard['directory']}"
+    rows = shard['rows']
+    items = [('/' if page == 'index.html' else href(page), Path(page).stem, '') for page in rows]
+    title = f"{directory} のページ一覧"
+    return render_page(path, title, f"{Path(rows[0]).stem} 〜 {Path(rows[-1]).stem}",
+                       [{'title': directory, 'items': items}])
+
+
+def render_stations_index(path: str, shards: Dict[str, Dict]) -> str:
+    groups = {}
+    for shard_path, shard in sorted(shards.items()):
+        count = len({station for station, _ in shard['rows']})
+        groups.setdefault(shard['company'], []).append((href(shard_path), shard['line'], f"{count}駅"))
+    return render_page(path, '駅一覧', '路線を選ぶと、その路線の駅一覧を表示します。',
+                       [{'title': company, 'items': items} for company, items in groups.items()])
+
+
+def render_pages_index(path: str, shards: Dict[str, Dict]) -> str:
+    groups = {}
+    for shard_path, shard in shards.items():
+        directory = '/ (ルート)' if shard['directory'] == '.' else f"/{shard['directory']}"
+        first, last = Path(shard['rows'][0]).stem, Path(shard['rows'][-1]).stem
+        groups.setdefault(directory, []).append((href(shard_path), f"{first} 〜 {last}", f"{len(shard['rows'])}ページ"))
+    return render_page(path, 'サイト内の全ページ一覧', 'ディレクトリごとに分割したページ一覧です。自動生成されます。',
+                       [{'title': directory, 'items': items} for directory, items in groups.items()])
+
+
+def listed_pages() -> List[str]:
+    """Return the pages the all-pages listing covers (everything but the two indexes)."""
+    return [page for page in find_html_files(include_index=True) if page not in (str(STATIONS_INDEX), str(PAGES_INDEX))]
+
+
+def digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def write_page(job: tuple):
+    """Render and write one shard or index (runs in a worker process)."""
+    path, render, shard = job
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(render(path, shard))
+
+
+def build(stations: List[Dict], pages: List[str], shard_size: int, force: bool = False,
+          workers: Optional[int] = None) -> Dict:
+    """Render changed shards and indexes; return counts of written and removed files."""
+    old_manifest = load_manifest(MANIFEST_FILE)
+    manifest = {}
+    jobs = []
+
+    s_shards = station_shards(stations)
+    p_shards = page_shards(pages, shard_size)
+    for shards, render in ((s_shards, render_station_shard), (p_shards, render_pages_shard)):
+        for path, shard in shards.items():
+            manifest[path] = digest(shard)
+            if force or old_manifest.get(path) != manifest[path] or not Path(path).exists():
+                jobs.append((path, render, shard))
+
+    indexes = ((str(STATIONS_INDEX), render_stations_index, s_shards),
+               (str(PAGES_INDEX), render_pages_index, p_shards))
+    for path, render, shards in indexes:
+        manifest[path] = digest(sorted(manifest[p] for p in shards) + sorted(shards))
+        if force or old_manifest.get(path) != manifest[path]:
+            jobs.append((path, render, shards))
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(write_page, jobs, chunksize=8))
+
+    removed = 0
+    for path in old_manifest:
+        if path not in manifest and Path(path).exists():
+            Path(path).unlink()
+            removed += 1
+
+    save_manifest(MANIFEST_FILE, manifest)
+    return {'shards': len(s_shards) + len(p_shards), 'written': len(jobs), 'removed': removed}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Generate sharded station and page listings')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE,
+                        help=f'Pages per all-pages shard (default: {SHARD_SIZE})')
+    parser.add_argument('--force', action='store_true', help='Re-render every shard')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    with open('stations.json', 'r', encoding='utf-8') as f:
+        stations = json.load(f)
+    stats = build(stations, listed_pages(), args.shard_size, args.force, args.workers)
+    print(f"📚 {stats['shards']} shards, {stats['written']} files written, {stats['removed']} removed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Melody Reconciler
+=================
+Find close matches in audio/ for the files listed in missing_melodies.txt and
+apply a reviewed remap to stations.json in bulk.
+
+Names are normalized (NFKC for full/half width, case folding, katakana to
+hiragana, spaces and brackets removed) and indexed by character trigrams.
+Each missing file only scores the audio files that share a trigram with it
+(Dice coefficient over trigram sets), so ranking does not compare every pair.
+
+Usage:
+    python melody_reconciler.py suggest                  # writes melody_remap.json
+    python melody_reconciler.py suggest --threshold 0.8  # auto-accept cutoff
+    python melody_reconciler.py apply                    # applies accepted entries
+
+Review melody_remap.json before applying: each entry lists ranked candidates,
+and "replacement" (pre-filled when the best score passes --threshold) is what
+`apply` writes into the `file` fields of stations.json. Set it to null to skip.
+"""
+
+import argparse
+import json
+import re
+import sys
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+AUDIO_DIR = Path('audio')
+MISSING_FILE = Path('missing_melodies.txt')
+STATIONS_FILE = Path('stations.json')
+REMAP_FILE = Path('melody_remap.json')
+
+NGRAM = 3
+IGNORED_CHARS = re.compile(r'[\s()\[\]「」『』（）〜~\-_.・]')
+
+
+def normalize(name: str) -> str:
+    """Normalize a melody filename for fuzzy comparison."""
+    name = re.sub(r'\.mp3$', '', name, flags=re.IGNORECASE)
+    name = unicodedata.normalize('NFKC', name).casefold()
+    # Katakana → hiragana so ぐルぐル and ぐるぐる compare equal
+    name = ''.join(chr(ord(ch) - 0x60) if 'ァ' <= ch <= 'ヶ' else ch for ch in name)
+    return IGNORED_CHARS.sub('', name)
+
+
+def ngrams(text: str) -> set:
+    padded = f"^{text}$"
+    if len(padded) <= NGRAM:
+        return {padded}
+    return {padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+
+class NgramIndex:
+    """Inverted trigram index over the audio inventory."""
+
+    def __init__(self, names: List[str]):
+        self.names = names
+        self.grams = [ngrams(normalize(name)) for name in names]
+        self.postings = defaultdict(list)
+        for doc, grams in enumerate(self.grams):
+            for gram in grams:
+                self.postings[gram].append(doc)
+
+    def search(self, query: str, limit: int = 5) -> List[Dict]:
+        """Return the best matches for query, ranked by Dice similarity."""
+        query_grams = ngrams(normalize(query))
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self.postings.get(gram, ()))
+        scored = []
+        for doc, common in shared.items():
+            score = 2 * common / (len(query_grams) + len(self.grams[doc]))
+            scored.append((score, self.names[doc]))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [{'file': name, 'score': round(score, 3)} for score, name in scored[:limit]]
+
+
+def load_missing() -> List[str]:
+    """Return missing_melodies.txt entries that are still missing from audio/."""
+    if not MISSING_FILE.exists():
+        return []
+    with open(MISSING_FILE, 'r', encoding='utf-8') as f:
+        entries = [line.strip() for line in f if line.strip()]
+    return [e for e in entries if normalize(e) and not (AUDIO_DIR / e).exists()]
+
+
+def suggest(threshold: float, limit: int) -> List[Dict]:
+    inventory = sorted(p.name for p in AUDIO_DIR.glob('*.mp3'))
+    index = NgramIndex(inventory)
+    remap = []
+    for missing in load_missing():
+        candidates = index.search(missing, limit)
+        best = candidates[0] if candidates else None
+        remap.append({
+            'missing': f"{AUDIO_DIR.name}/{missing}",
+            'candidates': candidates,
+            'replacement': f"{AUDIO_DIR.name}/{best['file']}" if best and best['score'] >= threshold else None,
+        })
+    return remap
+
+
+def apply_remap(remap: List[Dict]) -> Dict[str, int]:
+    """Rewrite the `file` fields of stations.json in place, keeping its formatting."""
+    content = STATIONS_FILE.read_text(encoding='utf-8')
+    counts = {}
+    for entry in remap:
+        replacement = entry.get('replacement')
+        if not replacement:
+            continue
+        if not Path(replacement).exists():
+            print(f"  ⚠ Skipping {entry['missing']}: {replacement} does not exist")
+            continue
+        old = f'"file": {json.dumps(entry["missing"], ensure_ascii=False)}'
+        new = f'"file": {json.dumps(replacement, ensure_ascii=False)}'
+        counts[entry['missing']] = content.count(old)
+        content = content.replace(old, new)
+    json.loads(content)  # never write an invalid catalog
+    STATIONS_FILE.write_text(content, encoding='utf-8')
+    return counts
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Reconcile missing melodies with the audio library')
+    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+
+    suggest_parser = subparsers.add_parser('suggest', help='Rank candidates and write a remap for review')
+    suggest_parser.add_argument('--threshold', type=float, default=0.9,
+                                help='Pre-accept the best candidate at or above this score (default: 0.9)')
+    suggest_parser.add_argument('--limit', type=int, default=5, help='Candidates per entry (default: 5)')
+    suggest_parser.add_argument('--output', default=str(REMAP_FILE), help='Remap file (default: melody_remap.json)')
+
+    apply_parser = subparsers.add_parser('apply', help='Apply a reviewed remap to stations.json')
+    apply_parser.add_argument('remap', nargs='?', default=str(REMAP_FILE), help='Remap file to apply')
+
+    args = parser.parse_args(argv)
+    if not args.command:
+        parser.print_help()
+        return
+
+    if args.command == 'suggest':
+        remap = suggest(args.threshold, args.limit)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(remap, f, ensure_ascii=False, indent=2)
+        accepted = [e for e in remap if e['replacement']]
+        print(f"🔎 {len(remap)} missing files, {len(accepted)} with a suggested replacement")
+        for entry in remap:
+            best = entry['candidates'][0] if entry['candidates'] else None
+            mark = '✓' if entry['replacement'] else ' '
+            hint = f"{best['file']} ({best['score']:.2f})" if best else '-'
+            print(f"  {mark} {entry['missing']} → {hint}")
+        print(f"\nReview {args.output}, then run: python melody_reconciler.py apply")
+
+    elif args.command == 'apply':
+        with open(args.remap, 'r', encoding='utf-8') as f:
+            remap = json.load(f)
+        counts = apply_remap(remap)
+        for missing, count in counts.items():
+            print(f"  ✓ {missing}: {count} rows")
+        print(f"📝 Updated {sum(counts.values())} rows in {STATIONS_FILE}")
+        if counts:
+            print("Run stationmelodies.py to refresh missing_melodies.txt")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,229 @@
+// Mobile menu: header button, slide-in panel and virtualized station/melody search.
+// update_headers.py links this from every page; edit it here, not in the pages.
+(function(){
+  // create and insert the header button so it truly lives in the header
+  const header = document.querySelector('header');
+  const mobileBtn = document.createElement('button');
+  mobileBtn.id = 'mobileMenuButton';
+  mobileBtn.className = 'mobile-menu-btn';
+  mobileBtn.title = 'メニュー';
+  mobileBtn.setAttribute('aria-controls','mobileMenuPanel');
+  mobileBtn.setAttribute('aria-expanded','false');
+  mobileBtn.innerHTML = '<svg class="icon" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg"><path d="M4 7h16M4 12h16M4 17h16" stroke="#1976d2" stroke-width="2" stroke-linecap="round"/></svg>';
+  if (header) header.appendChild(mobileBtn);
+
+  const btn = mobileBtn;
+  const overlay = document.getElementById('mobileMenuOverlay');
+  const panel = document.getElementById('mobileMenuPanel');
+  const closeBtn = document.getElementById('mobileMenuClose');
+  const searchForm = document.getElementById('mobileMenuSearchForm');
+  const searchInput = document.getElementById('mobileMenuSearchInput');
+  const resultsEl = document.getElementById('mobileSearchResults');
+
+  function openMenu(){
+    overlay.classList.add('visible');
+    // allow layout, then fade panel in
+    requestAnimationFrame(()=> {
+      requestAnimationFrame(()=> panel.classList.add('open'));
+    });
+    document.body.classList.add('mobile-menu-open');
+    btn.setAttribute('aria-expanded','true');
+    overlay.setAttribute('aria-hidden','false');
+    
+  }
+  function closeMenu(){
+    // Remove both classes simultaneously for smooth fade out
+    panel.classList.remove('open');
+    overlay.classList.remove('visible');
+    btn.setAttribute('aria-expanded','false');
+    overlay.setAttribute('aria-hidden','true');
+    document.body.classList.remove('mobile-menu-open');
+    if (player) player.pause();
+    // Focus button after animation completes
+    setTimeout(()=> btn.focus(), 400);
+  }
+
+  btn.addEventListener('click', (e)=>{ e.preventDefault(); openMenu(); });
+  closeBtn.addEventListener('click', (e)=>{ e.preventDefault(); closeMenu(); });
+  overlay.addEventListener('click', (e)=>{ if (!panel.contains(e.target)) closeMenu(); });
+  document.addEventListener('keydown', (e)=>{ if (e.key === 'Escape') closeMenu(); });
+
+  // search helper: ensure we have stations data, fetch if necessary
+  let searchKeys = null;
+  async function ensureStationsData(){
+    if (!(window.stationsData && Array.isArray(window.stationsData) && window.stationsData.length>0)) {
+      try {
+        const res = await fetch('/stations.json');
+        if (!res.ok) throw new Error('stations.json fetch failed');
+        window.stationsData = await res.json();
+      } catch (err) {
+        console.error('Failed to load stations.json for mobile search', err);
+        return null;
+      }
+    }
+    // lowercase the searchable text once instead of on every keystroke
+    if (!searchKeys || searchKeys.length !== window.stationsData.length) {
+      searchKeys = window.stationsData.map(st => ((st.station||'') + '\n' + (st.melody||'')).toLowerCase());
+    }
+    return window.stationsData;
+  }
+
+  // query -> matching row indices; a longer query narrows the cached result of its prefix
+  const resultCache = new Map();
+  const CACHE_LIMIT = 50;
+  function findMatches(lowerQ){
+    if (resultCache.has(lowerQ)) return resultCache.get(lowerQ);
+    let candidates = null;
+    for (let i = lowerQ.length - 1; i > 0 && !candidates; i--) {
+      candidates = resultCache.get(lowerQ.slice(0, i)) || null;
+    }
+    const matches = [];
+    if (candidates) {
+      for (const idx of candidates) if (searchKeys[idx].includes(lowerQ)) matches.push(idx);
+    } else {
+      for (let idx = 0; idx < searchKeys.length; idx++) if (searchKeys[idx].includes(lowerQ)) matches.push(idx);
+    }
+    if (resultCache.size >= CACHE_LIMIT) resultCache.delete(resultCache.keys().next().value);
+    resultCache.set(lowerQ, matches);
+    return matches;
+  }
+
+  function escapeHtml(str){
+    return String(str).replace(/[&<>"]/g, s => ({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;'}[s]));
+  }
+  function urlOf(file){
+    return file.match(/^https?:\/\//) ? file : (file.startsWith('/') ? file : '/' + file);
+  }
+  function audioSrcOf(st){
+    return st.file ? urlOf(st.file) : '';
+  }
+  // start on the preview clip (preview_clips.py) and move to the full file once it has loaded, or when the clip ends
+  function switchToFull(){
+    const full = player.dataset.full;
+    if (!full) return;
+    delete player.dataset.full;
+    const at = player.currentTime;
+    const resume = !player.paused || player.ended;
+    player.src = full;
+    player.addEventListener('loadedmetadata', ()=>{
+      if (player.getAttribute('src') !== full) return;
+      player.currentTime = at;
+      if (resume) player.play().catch(err => console.log('Autoplay prevented:', err));
+    }, { once: true });
+  }
+  function loadFromPreview(st){
+    const full = audioSrcOf(st);
+    if (!st.preview) { delete player.dataset.full; player.src = full; return; }
+    player.dataset.full = full;
+    player.src = urlOf(st.preview);
+    const loader = new Audio();
+    loader.preload = 'auto';
+    loader.addEventListener('canplaythrough', ()=>{ if (player.dataset.full === full) switchToFull(); }, { once: true });
+    loader.src = full;
+  }
+
+  // virtualized result list: only the rows inside the scrolled viewport exist in the DOM
+  const ROW_HEIGHT = 112;
+  const OVERSCAN = 4;
+  let currentMatches = [];
+  let renderedRange = '';
+  let player = null;
+  let playingIndex = -1;
+
+  function renderRow(pos){
+    const st = window.stationsData[currentMatches[pos]];
+    const stationUrl = `/stations/${encodeURIComponent(st.station)}.html`;
+    const melodyUrl = `/melodies/${encodeURIComponent(st.melody)}.html`;
+    const playButton = audioSrcOf(st)
+      ? `<button type="button" data-play="${pos}" style="margin-top:8px;padding:6px 14px;border-radius:8px;border:1px solid #bcd;background:#f7fbff;color:#1976d2;font-weight:700;">▶ 再生</button>`
+      : '';
+    return `<div class="mobile-menu-result" data-pos="${pos}" style="position:absolute;left:0;right:0;top:${pos * ROW_HEIGHT}px;height:${ROW_HEIGHT - 8}px;box-sizing:border-box;overflow:hidden;margin:0;">
+        <div><a href="${stationUrl}">${escapeHtml(st.station)}</a> <span style="color:#666;">(${escapeHtml(st.line||'')})</span></div>
+        <div style="color:#444;margin-top:6px;"><a href="${melodyUrl}">${escapeHtml(st.melody)}</a></div>
+        <div class="mobile-menu-player">${playButton}</div>
+      </div>`;
+  }
+
+  function renderWindow(){
+    const list = resultsEl.firstElementChild;
+    if (!list || !currentMatches.length) return;
+    const offset = panel.scrollTop - resultsEl.offsetTop;
+    const first = Math.max(0, Math.floor(offset / ROW_HEIGHT) - OVERSCAN);
+    const last = Math.min(currentMatches.length, Math.ceil((offset + panel.clientHeight) / ROW_HEIGHT) + OVERSCAN);
+    const range = first + ':' + last;
+    if (range === renderedRange) return;
+    renderedRange = range;
+    let html = '';
+    for (let pos = first; pos < last; pos++) html += renderRow(pos);
+    list.innerHTML = html;
+    // keep the active player attached to its row while it is in view
+    if (player && playingIndex >= first && playingIndex < last) {
+      const slot = list.querySelector(`[data-pos="${playingIndex}"] .mobile-menu-player`);
+      if (slot) { slot.innerHTML = ''; slot.appendChild(player); }
+    }
+  }
+
+  let scrollScheduled = false;
+  panel.addEventListener('scroll', ()=>{
+    if (scrollScheduled) return;
+    scrollScheduled = true;
+    requestAnimationFrame(()=>{ scrollScheduled = false; renderWindow(); });
+  }, { passive: true });
+
+  // create the audio element only when a result is actually played
+  resultsEl.addEventListener('click', (e)=>{
+    const button = e.target.closest('[data-play]');
+    if (!button) return;
+    const pos = Number(button.dataset.play);
+    const st = window.stationsData[currentMatches[pos]];
+    if (!player) {
+      player = document.createElement('audio');
+      player.controls = true;
+      player.setAttribute('controlsList', 'nodownload');
+      player.style.width = '100%';
+      player.addEventListener('ended', switchToFull);
+    }
+    loadFromPreview(st);
+    playingIndex = pos;
+    button.parentNode.replaceChild(player, button);
+    player.play().catch(err => console.log('Autoplay prevented:', err));
+  });
+
+  function showMessage(targetEl, message){
+    currentMatches = [];
+    renderedRange = '';
+    if (targetEl) targetEl.innerHTML = message ? `<div style="padding:12px;color:#888;">${message}</div>` : '';
+  }
+
+  let searchSeq = 0;
+  async function performSearch(q, targetEl){
+    const seq = ++searchSeq;
+    if (!q) { showMessage(targetEl, ''); return; }
+    const data = await ensureStationsData();
+    if (seq !== searchSeq) return; // a newer query has started
+    if (!data) { showMessage(targetEl, '検索データを読み込み中です…'); return; }
+    const matches = findMatches(q.toLowerCase());
+    if (matches.length === 0) { showMessage(targetEl, '該当なし'); return; }
+    if (player) { player.pause(); playingIndex = -1; }
+    currentMatches = matches;
+    renderedRange = '';
+    if (targetEl) {
+      targetEl.innerHTML = `<div style="position:relative;height:${matches.length * ROW_HEIGHT}px;"></div>`;
+      renderWindow();
+    }
+  }
+
+  // wire events
+  let debounceTimer = null;
+  searchForm.addEventListener('submit', function(e){
+    e.preventDefault();
+    clearTimeout(debounceTimer);
+    performSearch(searchInput.value.trim(), resultsEl);
+  });
+  searchInput.addEventListener('input', function(){
+    clearTimeout(debounceTimer);
+    const value = this.value.trim();
+    debounceTimer = setTimeout(()=> performSearch(value, resultsEl), 200);
+  });
+
+})();
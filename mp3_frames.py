@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+MP3 frame helpers
+=================
+Minimal pure-Python MPEG audio frame header parsing, shared by the build
+scripts that need durations or frame boundaries of the files in audio/, plus
+rewriting of the Xing/Info (and LAME) header frame for files cut at a frame
+boundary.
+
+Usage:
+    python mp3_frames.py audio/首都圏11番.mp3
+"""
+
+import struct
+import sys
+from typing import Dict, Iterator, List, Optional
+
+# Bitrates in kbit/s indexed by [version_is_mpeg1][layer][index]
+BITRATES = {
+    True: {
+        1: [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+        2: [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+        3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    },
+    False: {
+        1: [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+        2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+        3: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    },
+}
+
+# Sample rates indexed by version bits (0: MPEG2.5, 2: MPEG2, 3: MPEG1)
+SAMPLE_RATES = {
+    3: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    0: [11025, 12000, 8000],
+}
+
+LAYERS = {3: 1, 2: 2, 1: 3}
+
+# Xing/Info header flags
+XING_FRAMES, XING_BYTES, XING_TOC, XING_QUALITY = 0x1, 0x2, 0x4, 0x8
+
+# Encoder strings that start a LAME-layout extension after the Xing fields
+LAME_TAGS = (b'LAME', b'Lavf', b'Lavc', b'L3.9', b'GOGO')
+
+
+def _crc16_table() -> List[int]:
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+CRC16_TABLE = _crc16_table()
+
+
+def id3v2_size(data: bytes) -> int:
+    """Return the byte length of a leading ID3v2 tag (0 if there is none)."""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def parse_header(data: bytes, offset: int) -> Optional[Dict]:
+    """Parse the 4-byte frame header at offset, or return None if invalid."""
+    if offset + 4 > len(data):
+        return None
+    header = struct.unpack('>I', data[offset:offset + 4])[0]
+    if header >> 21 != 0x7FF:
+        return None
+
+    version_bits = (header >> 19) & 0x3
+    layer_bits = (header >> 17) & 0x3
+    bitrate_index = (header >> 12) & 0xF
+    rate_index = (header >> 10) & 0x3
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version_bits == 3
+    layer = LAYERS[layer_bits]
+    bitrate = BITRATES[mpeg1][layer][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version_bits][rate_index]
+    padding = (header >> 9) & 0x1
+    channel_mode = (header >> 6) & 0x3
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or mpeg1) else 576
+        length = (samples // 8) * bitrate // sample_rate + padding
+
+    return {
+        'offset': offset,
+        'length': length,
+        'samples': samples,
+        'sample_rate': sample_rate,
+        'bitrate': bitrate,
+        'mpeg1': mpeg1,
+        'layer': layer,
+        'mono': channel_mode == 3,
+    }
+
+
+def side_info_size(frame: Dict) -> int:
+    """Return the Layer III side info length, where a Xing/Info tag starts."""
+    if frame['mpeg1']:
+        return 17 if frame['mono'] else 32
+    return 9 if frame['mono'] else 17
+
+
+def crc16(data: bytes, crc: int = 0) -> int:
+    """CRC-16 (polynomial 0x8005, reflected) as stored in the LAME tag."""
+    for byte in data:
+        crc = (crc >> 8) ^ CRC16_TABLE[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def info_tag_offset(data: bytes, frame: Dict) -> Optional[int]:
+    """Return the offset of the Xing/Info tag inside a Layer III frame, if any."""
+    if frame['layer'] != 3:
+        return None
+    start = frame['offset'] + 4 + side_info_size(frame)
+    if data[start:start + 4] not in (b'Xing', b'Info'):
+        return None
+    return start
+
+
+def xing_frame_count(data: bytes, frame: Dict) -> Optional[int]:
+    """Return the frame count stored in a Xing/Info header frame, if present."""
+    start = info_tag_offset(data, frame)
+    if start is None:
+        return None
+    flags = struct.unpack('>I', data[start + 4:start + 8])[0]
+    if not flags & XING_FRAMES:
+        return None
+    return struct.unpack('>I', data[start + 8:start + 12])[0]
+
+
+def rewrite_info_frame(data: bytes, info: Dict, frames: List[Dict]) -> bytes:
+    """Return the Xing/Info frame `info` rewritten to describe only `frames`.
+
+    Updates the frame and byte counts, rebuilds the seek TOC and, when a
+    LAME-layout extension follows, its music length, music CRC, end padding
+    and tag CRC. The frame keeps its length, so no audio bytes move.
+    """
+    frame = bytearray(data[info['offset']:info['offset'] + info['length']])
+    tag = 4 + side_info_size(info)
+    flags = struct.unpack('>I', frame[tag + 4:tag + 8])[0]
+    audio = b''.join(data[f['offset']:f['offset'] + f['length']] for f in frames)
+    total = len(frame) + len(audio)
+
+    cursor = tag + 8
+    if flags & XING_FRAMES:
+        struct.pack_into('>I', frame, cursor, len(frames))
+        cursor += 4
+    if flags & XING_BYTES:
+        struct.pack_into('>I', frame, cursor, total)
+        cursor += 4
+    if flags & XING_TOC:
+        starts, position = [], len(frame)
+        for f in frames:
+            starts.append(position)
+            position += f['length']
+        for i in range(100):
+            index = min(len(frames) - 1, round(i * len(frames) / 100)) if frames else 0
+            byte = starts[index] if frames else 0
+            frame[cursor + i] = min(255, byte * 256 // total)
+        cursor += 100
+    if flags & XING_QUALITY:
+        cursor += 4
+
+    lame = cursor
+    if frame[lame:lame + 4] in LAME_TAGS and len(frame) >= lame + 36:
+        # The cut ends on a whole frame, so there is no encoder padding to skip
+        frame[lame + 22] &= 0xF0
+        frame[lame + 23] = 0
+        struct.pack_into('>I', frame, lame + 28, total)
+        struct.pack_into('>H', frame, lame + 32, crc16(audio))
+        struct.pack_into('>H', frame, lame + 34, crc16(bytes(frame[:lame + 34])))
+    return bytes(frame)
+
+
+def find_first_frame(data: bytes, start: int = 0) -> Optional[Dict]:
+    """Find the first frame whose successor also parses (guards against false syncs)."""
+    offset = start
+    while True:
+        offset = data.find(b'\xff', offset)
+        if offset == -1:
+            return None
+        frame = parse_header(data, offset)
+        if frame and (offset + frame['length'] >= len(data)
+                      or parse_header(data, offset + frame['length'])):
+            return frame
+        offset += 1
+
+
+def iter_frames(data: bytes) -> Iterator[Dict]:
+    """Yield the audio frames of an MP3, starting after any ID3v2 tag."""
+    frame = find_first_frame(data, id3v2_size(data))
+    while frame:
+        yield frame
+        frame = parse_header(data, frame['offset'] + frame['length'])
+
+
+def duration_ms(path: str) -> int:
+    """Return the playback length of an MP3 file in milliseconds."""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    first = find_first_frame(data, id3v2_size(data))
+    if not first:
+        return 0
+    frames = xing_frame_count(data, first)
+    if frames:
+        return frames * first['samples'] * 1000 // first['sample_rate']
+
+    samples = 0
+    sample_rate = first['sample_rate']
+    for frame in iter_frames(data):
+        samples += frame['samples']
+    return samples * 1000 // sample_rate
+
+
+if __name__ == '__main__':
+    for arg in sys.argv[1:]:
+        print(f"{arg}: {duration_ms(arg) / 1000:.2f}s")
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Page Audit
+==========
+Measure how many bytes of each generated page are shared boilerplate and
+enforce per-page byte budgets.
+
+Every page is split into components:
+    header     the <header> injected by update_headers.py
+    menu-css   the mobile menu <style> block (MOBILE_MENU_STYLES)
+    menu-html  the mobile menu overlay markup (MOBILE_MENU_HTML)
+    menu-js    the mobile menu <script> tag (MOBILE_MENU_SCRIPT; the code is in mobile-menu.js)
+    cards      update cards rendered by update_manager.py
+    audio      <audio> elements
+    body       everything else
+and each is measured raw and gzip-compressed. <style>, <script> and the
+injected blocks are also hashed across pages to find byte-identical blocks.
+
+Budgets are read from page_budgets.json (glob -> {component: max raw bytes},
+"total" and "total-gz" included); the most specific matching glob wins. The
+budgets are the page-weight targets, not the sizes of the current build; a
+page allowed past its target gets its own entry with a "note" saying why.
+
+Usage:
+    python page_audit.py                          # summary report
+    python page_audit.py --json audit.json        # also save the full report
+    python page_audit.py --baseline audit.json    # fail if pages grew
+    python page_audit.py --budgets page_budgets.json
+
+Exits with status 1 when a budget is exceeded or a page regressed.
+"""
+
+import argparse
+import fnmatch
+import gzip
+import hashlib
+import json
+import re
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from update_headers import find_header_end, find_menu_script, find_html_files
+
+BUDGETS_FILE = Path('page_budgets.json')
+COMPONENTS = ['header', 'menu-css', 'menu-html', 'menu-js', 'cards', 'audio', 'body']
+
+CARD_MARKERS = ('<!-- Recent Update Item:', '<!-- Update Entry:')
+BLOCK_PATTERN = re.compile(r'<(style|script)\b[^>]*>.*?</\1>', re.DOTALL | re.IGNORECASE)
+AUDIO_PATTERN = re.compile(r'<audio\b[^>]*>.*?</audio>|<audio\b[^>]*/>', re.DOTALL | re.IGNORECASE)
+
+# Blocks smaller than this are not worth reporting as duplicates
+MIN_DUPLICATE_BYTES = 256
+
+
+def gz_size(data: bytes) -> int:
+    return len(gzip.compress(data, compresslevel=9, mtime=0))
+
+
+def div_end(content: str, start: int) -> int:
+    """Return the index just past the </div> closing the <div> at start."""
+    depth = 0
+    for match in re.finditer(r'<div\b|</div>', content[start:]):
+        depth += 1 if match.group(0) == '<div' else -1
+        if depth == 0:
+            return start + match.end()
+    return len(content)
+
+
+def find_spans(content: str) -> List[Tuple[str, int, int]]:
+    """Return (component, start, end) spans of the known boilerplate blocks."""
+    spans = []
+
+    start = content.find('<header')
+    if start != -1:
+        end = find_header_end(content, start + 1)
+        if end != -1:
+            spans.append(('header', start, end))
+
+    start = content.find('<!-- Redesigned Mobile Menu:')
+    if start != -1:
+        end = content.find('</style>', start)
+        if end != -1:
+            spans.append(('menu-css', start, end + len('</style>')))
+
+    start = content.find('<div id="mobileMenuOverlay"')
+    if start != -1:
+        # Include the marker comment that precedes the overlay markup
+        marker = '<!-- overlay + panel markup -->'
+        comment = content.rfind(marker, 0, start)
+        if comment != -1 and not content[comment + len(marker):start].strip():
+            start_with_comment = comment
+        else:
+            start_with_comment = start
+        spans.append(('menu-html', start_with_comment, div_end(content, start)))
+
+    script = find_menu_script(content)
+    if script:
+        spans.append(('menu-js', *script))
+
+    for marker in CARD_MARKERS:
+        for match in re.finditer(re.escape(marker), content):
+            div = content.find('<div', match.end())
+            if div != -1:
+                spans.append(('cards', match.start(), div_end(content, div)))
+
+    for match in AUDIO_PATTERN.finditer(content):
+        spans.append(('audio', match.start(), match.end()))
+
+    # Drop spans nested inside an earlier one (e.g. audio inside a card)
+    spans.sort(key=lambda s: (s[1], -s[2]))
+    flat, last_end = [], -1
+    for span in spans:
+        if span[1] >= last_end:
+            flat.append(span)
+            last_end = span[2]
+    return flat
+
+
+def audit_page(page: str) -> Dict:
+    """Measure one page (runs in a worker process)."""
+    with open(page, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    parts = defaultdict(list)
+    cursor = 0
+    for component, start, end in find_spans(content):
+        parts['body'].append(content[cursor:start])
+        parts[component].append(content[start:end])
+        cursor = end
+    parts['body'].append(content[cursor:])
+
+    raw = content.encode('utf-8')
+    sizes = {}
+    for component in COMPONENTS:
+        data = ''.join(parts.get(component, [])).encode('utf-8')
+        sizes[component] = {'raw': len(data), 'gz': gz_size(data) if data else 0}
+    sizes['total'] = {'raw': len(raw), 'gz': gz_size(raw)}
+
+    blocks = {}
+    candidates = [m.group(0) for m in BLOCK_PATTERN.finditer(content)]
+    candidates += [''.join(parts[c]) for c in ('header', 'menu-html') if parts.get(c)]
+    for block in candidates:
+        data = block.encode('utf-8')
+        if len(data) >= MIN_DUPLICATE_BYTES:
+            blocks[hashlib.sha1(data).hexdigest()] = [len(data), block[:60].replace('\n', ' ')]
+    return {'page': page, 'sizes': sizes, 'blocks': blocks}
+
+
+def find_duplicates(results: List[Dict]) -> List[Dict]:
+    """Return blocks that appear byte-identical on more than one page."""
+    seen = {}
+    for result in results:
+        for digest, (size, preview) in result['blocks'].items():
+            entry = seen.setdefault(digest, {'size': size, 'preview': preview, 'pages': 0})
+            entry['pages'] += 1
+    duplicates = [dict(entry, digest=digest, wasted=entry['size'] * (entry['pages'] - 1))
+                  for digest, entry in seen.items() if entry['pages'] > 1]
+    return sorted(duplicates, key=lambda d: -d['wasted'])
+
+
+def load_budgets(path: Path) -> Dict[str, Dict[str, int]]:
+    if not path.exists():
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def budget_for(page: str, budgets: Dict[str, Dict[str, int]]) -> Dict[str, int]:
+    """Return the budget of the most specific glob matching the page."""
+    matches = [pattern for pattern in budgets if fnmatch.fnmatch(page, pattern)]
+    if not matches:
+        return {}
+    return budgets[max(matches, key=lambda p: len(p.replace('*', '')))]
+
+
+def check_budgets(results: List[Dict], budgets: Dict) -> List[str]:
+    violations = []
+    for result in results:
+        for key, limit in budget_for(result['page'], budgets).items():
+            if not isinstance(limit, int):
+                continue
+            if key == 'total-gz':
+                actual = result['sizes']['total']['gz']
+            else:
+                actual = result['sizes'].get(key, {}).get('raw', 0)
+            if actual > limit:
+                violations.append(f"{result['page']}: {key} {actual:,} > {limit:,} bytes")
+    return violations
+
+
+def check_regressions(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """Compare compressed page totals against a previous --json report."""
+    previous = {r['page']: r['sizes']['total']['gz'] for r in baseline.get('pages', [])}
+    regressions = []
+    for result in results:
+        before = previous.get(result['page'])
+        after = result['sizes']['total']['gz']
+        if before and after > before * (1 + tolerance):
+            regressions.append(f"{result['page']}: {before:,} → {after:,} gz bytes")
+    return regressions
+
+
+def print_report(results: List[Dict], duplicates: List[Dict], top: int):
+    count = len(results) or 1
+    totals = {c: sum(r['sizes'][c]['raw'] for r in results) for c in COMPONENTS + ['total']}
+    gz_totals = {c: sum(r['sizes'][c]['gz'] for r in results) for c in COMPONENTS + ['total']}
+    print(f"📊 {len(results)} pages, {totals['total']:,} bytes raw / {gz_totals['total']:,} bytes gzip")
+    print(f"\n{'component':10} {'avg raw':>10} {'avg gz':>9} {'share':>7}")
+    for component in COMPONENTS:
+        share = totals[component] / (totals['total'] or 1)
+        print(f"{component:10} {totals[component] // count:>10,} {gz_totals[component] // count:>9,} {share:>7.1%}")
+
+    heaviest = sorted(results, key=lambda r: -r['sizes']['total']['gz'])[:top]
+    print(f"\n🏋️  Heaviest {len(heaviest)} pages (gzip):")
+    for result in heaviest:
+        print(f"  {result['sizes']['total']['gz']:>8,}  {result['page']}")
+
+    if duplicates:
+        wasted = sum(d['wasted'] for d in duplicates)
+        print(f"\n♻️  {len(duplicates)} blocks repeated across pages, {wasted:,} duplicated bytes:")
+        for duplicate in duplicates[:top]:
+            print(f"  {duplicate['size']:>7,} B × {duplicate['pages']:>4} pages  {duplicate['preview']}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Audit page weight by component')
+    parser.add_argument('pages', nargs='*', help='Pages to audit (default: all)')
+    parser.add_argument('--budgets', default=str(BUDGETS_FILE), help='Budget file (default: page_budgets.json)')
+    parser.add_argument('--baseline', help='Previous --json report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.02,
+                        help='Allowed growth over the baseline (default: 0.02)')
+    parser.add_argument('--json', help='Write the full report to this file')
+    parser.add_argument('--top', type=int, default=10, help='Rows to show per section')
+    args = parser.parse_args(argv)
+
+    pages = args.pages or find_html_files(include_index=True)
+    with ProcessPoolExecutor() as pool:
+        results = list(pool.map(audit_page, pages, chunksize=32))
+    duplicates = find_duplicates(results)
+    print_report(results, duplicates, args.top)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'pages': [{k: v for k, v in r.items() if k != 'blocks'} for r in results],
+                       'duplicates': duplicates}, f, ensure_ascii=False, indent=2)
+
+    problems = check_budgets(results, load_budgets(Path(args.budgets)))
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            problems += check_regressions(results, json.load(f), args.tolerance)
+
+    if problems:
+        print(f"\n❌ {len(problems)} budget violations / regressions:")
+        for problem in problems[:50]:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("\n✅ All pages within budget")
+
+
+if __name__ == '__main__':
+    main()
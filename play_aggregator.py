@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Play Count Aggregator
+=====================
+Batch play events into compact deltas instead of running two Firebase
+transactions per play (see playcounter.js).
+
+Events are buffered in memory, rate limited per user with the same hourly/daily
+caps as playcounter.js, rolled up per melody and per day, and flushed to the
+store as one delta per interval (also while the stream is idle). Unique
+listeners are estimated with HyperLogLog sketches, so the store never holds
+user ids; the rate-limit windows are saved with each flush under hashed keys
+(rateLimits), so a restart does not reset the caps.
+
+The store is a local JSON file standing in for the Realtime Database; its
+layout mirrors the database paths (totalPlays, dailyPlays/<day>, ...).
+
+Usage:
+    python play_aggregator.py ingest events.jsonl --store play_counts.json
+    cat events.jsonl | python play_aggregator.py ingest - --interval 5
+    python play_aggregator.py report --store play_counts.json
+
+Each event line is JSON: {"uid": "...", "melody": "audio/xxx.mp3", "ts": 1735000000000}
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import math
+import queue
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+STORE_FILE = 'play_counts.json'
+
+# Same limits as playcounter.js
+HOURLY_LIMIT = 250
+DAILY_LIMIT = 500
+HOUR_MS = 3600_000
+DAY_MS = 24 * HOUR_MS
+
+HLL_PRECISION = 12  # 4096 one-byte registers, ~1.6% standard error
+
+
+class HyperLogLog:
+    """Fixed-size HyperLogLog sketch for unique listener estimates."""
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: Optional[bytes] = None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers else bytearray(self.size)
+
+    def add(self, value: str):
+        """Add a value to the sketch."""
+        h = int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog'):
+        """Merge another sketch into this one (register-wise max)."""
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self) -> int:
+        """Return the estimated number of distinct values."""
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Small range correction (linear counting)
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+    def to_json(self) -> str:
+        return base64.b64encode(bytes(self.registers)).decode('ascii')
+
+    @classmethod
+    def from_json(cls, data: str) -> 'HyperLogLog':
+        return cls(registers=base64.b64decode(data))
+
+
+class LocalStore:
+    """JSON file standing in for the Realtime Database."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.writes = 0
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+        else:
+            self.data = {}
+
+    def apply_delta(self, delta: Dict):
+        """Merge a flushed delta in a single write."""
+        data = self.data
+        data['totalPlays'] = data.get('totalPlays', 0) + delta['plays']
+        for section in ('melodyPlays', 'dailyPlays'):
+            counts = data.setdefault(section, {})
+            for key, count in delta[section].items():
+                counts[key] = counts.get(key, 0) + count
+        for section in ('dailyListeners', 'melodyListeners'):
+            sketches = data.setdefault(section, {})
+            for key, encoded in delta[section].items():
+                sketch = HyperLogLog.from_json(encoded)
+                if key in sketches:
+                    sketch.merge(HyperLogLog.from_json(sketches[key]))
+                sketches[key] = sketch.to_json()
+        if 'rateLimits' in delta:
+            data['rateLimits'] = delta['rateLimits']
+
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        self.writes += 1
+
+
+class PlayAggregator:
+    """Buffer play events and flush compact per-melody and per-day rollups."""
+
+    def __init__(self, store: LocalStore):
+        self.store = store
+        # Rate-limit windows keyed by user_key(uid), restored from the last flush
+        self.users = {key: dict(state) for key, state in store.data.get('rateLimits', {}).items()}
+        self.latest = max((state['hour_start'] for state in self.users.values()), default=0)
+        self.accepted = 0
+        self.rejected = 0
+        self._reset()
+
+    def _reset(self):
+        self.events = 0
+        self.plays = 0
+        self.melody_plays = defaultdict(int)
+        self.daily_plays = defaultdict(int)
+        self.daily_listeners = {}
+        self.melody_listeners = {}
+
+    def _allow(self, uid: str, now: int) -> bool:
+        """Apply the hourly/daily caps from playcounter.js."""
+        key = user_key(uid)
+        self.latest = max(self.latest, now)
+        state = self.users.get(key)
+        if state is None:
+            self.users[key] = {'hour_start': now, 'hour_count': 1, 'day_start': now, 'day_count': 1}
+            return True
+        if now - state['hour_start'] > HOUR_MS:
+            state['hour_start'], state['hour_count'] = now, 0
+        if state['hour_count'] >= HOURLY_LIMIT:
+            return False
+        if now - state['day_start'] > DAY_MS:
+            state['day_start'], state['day_count'] = now, 0
+        if state['day_count'] >= DAILY_LIMIT:
+            return False
+        state['hour_count'] += 1
+        state['day_count'] += 1
+        return True
+
+    def add_events(self, events: Iterable[Dict]):
+        """Accept a batch of play events into the buffer."""
+        for event in events:
+            self.events += 1
+            uid = str(event.get('uid', ''))
+            melody = event.get('melody') or '__unknown__'
+            now = int(event.get('ts') or time.time() * 1000)
+            if not uid or not self._allow(uid, now):
+                self.rejected += 1
+                continue
+            day = datetime.fromtimestamp(now / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+
+            self.plays += 1
+            self.melody_plays[melody] += 1
+            self.daily_plays[day] += 1
+            self.daily_listeners.setdefault(day, HyperLogLog()).add(uid)
+            self.melody_listeners.setdefault(melody, HyperLogLog()).add(uid)
+            self.accepted += 1
+
+    def _active_limits(self) -> Dict[str, Dict]:
+        """Return the rate-limit windows that can still reject a play."""
+        self.users = {key: state for key, state in self.users.items()
+                      if self.latest - state['day_start'] <= DAY_MS}
+        return {key: dict(state) for key, state in self.users.items()}
+
+    def flush(self) -> Optional[Dict]:
+        """Write the buffered rollups to the store as one delta."""
+        # Rejected plays still move the rate-limit windows, so they are saved too
+        if not self.events:
+            return None
+        delta = {
+            'plays': self.plays,
+            'melodyPlays': dict(self.melody_plays),
+            'dailyPlays': dict(self.daily_plays),
+            'dailyListeners': {k: v.to_json() for k, v in self.daily_listeners.items()},
+            'melodyListeners': {k: v.to_json() for k, v in self.melody_listeners.items()},
+            'rateLimits': self._active_limits(),
+        }
+        self.store.apply_delta(delta)
+        self._reset()
+        return delta
+
+
+def user_key(uid: str) -> str:
+    """Return the pseudonymous key under which a user's rate-limit window is kept."""
+    return hashlib.blake2b(uid.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def read_events(stream) -> Iterable[Dict]:
+    """Yield events from a JSON-lines stream, skipping malformed lines."""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            print(f"  ⚠ Skipping malformed event: {line[:80]}", file=sys.stderr)
+
+
+def ingest(aggregator: PlayAggregator, stream, interval: float, batch_size: int):
+    """Feed events in batches and flush once per interval, even while the stream is idle."""
+    events: queue.Queue = queue.Queue(maxsize=batch_size * 4)
+    done = object()
+
+    def read():
+        for event in read_events(stream):
+            events.put(event)
+        events.put(done)
+
+    # Reading in a thread lets the flush timer fire while waiting for input
+    threading.Thread(target=read, daemon=True).start()
+    last_flush = time.monotonic()
+    batch: List[Dict] = []
+    while True:
+        try:
+            event = events.get(timeout=max(0.0, interval - (time.monotonic() - last_flush)))
+        except queue.Empty:
+            event = None
+        if event is done:
+            break
+        if event is not None:
+            batch.append(event)
+            if len(batch) >= batch_size:
+                aggregator.add_events(batch)
+                batch = []
+        if time.monotonic() - last_flush >= interval:
+            aggregator.add_events(batch)
+            batch = []
+            aggregator.flush()
+            last_flush = time.monotonic()
+    aggregator.add_events(batch)
+    aggregator.flush()
+
+
+def report(store: LocalStore, top: int = 10):
+    """Print the totals held in the store."""
+    data = store.data
+    print(f"🎵 Total plays: {data.get('totalPlays', 0):,}")
+    daily = data.get('dailyPlays', {})
+    listeners = data.get('dailyListeners', {})
+    if daily:
+        print("\n📅 Daily:")
+        for day in sorted(daily):
+            unique = HyperLogLog.from_json(listeners[day]).count() if day in listeners else 0
+            print(f"  {day}: {daily[day]:,} plays, ~{unique:,} listeners")
+    melodies = sorted(data.get('melodyPlays', {}).items(), key=lambda kv: -kv[1])
+    if melodies:
+        print(f"\n🏆 Top {min(top, len(melodies))} melodies:")
+        for melody, count in melodies[:top]:
+            print(f"  {count:6,}  {melody}")
+
+
+def main(argv: Optional[List[str]] = None):
+    # --store is accepted before or after the command
+    store_parent = argparse.ArgumentParser(add_help=False)
+    store_parent.add_argument('--store', default=argparse.SUPPRESS,
+                              help=f'Store file (default: {STORE_FILE})')
+
+    parser = argparse.ArgumentParser(description='Batched play count aggregation', parents=[store_parent])
+    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+
+    ingest_parser = subparsers.add_parser('ingest', help='Aggregate play events', parents=[store_parent])
+    ingest_parser.add_argument('events', help="JSON-lines event file, or '-' for stdin")
+    ingest_parser.add_argument('--interval', type=float, default=5.0,
+                               help='Seconds between flushes (default: 5)')
+    ingest_parser.add_argument('--batch-size', type=int, default=500,
+                               help='Events per batch (default: 500)')
+
+    report_parser = subparsers.add_parser('report', help='Show aggregated counts', parents=[store_parent])
+    report_parser.add_argument('--top', type=int, default=10, help='Number of melodies to show')
+
+    args = parser.parse_args(argv)
+    if not args.command:
+        parser.print_help()
+        return
+
+    store = LocalStore(getattr(args, 'store', STORE_FILE))
+    if args.command == 'ingest':
+        aggregator = PlayAggregator(store)
+        if args.events == '-':
+            ingest(aggregator, sys.stdin, args.interval, args.batch_size)
+        else:
+            with open(args.events, 'r', encoding='utf-8') as f:
+                ingest(aggregator, f, args.interval, args.batch_size)
+        print(f"✅ Accepted {aggregator.accepted:,} plays, rejected {aggregator.rejected:,} "
+              f"in {store.writes} store writes")
+    elif args.command == 'report':
+        report(store, args.top)
+
+
+if __name__ == '__main__':
+    main()
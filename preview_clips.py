@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Preview Clips
+=============
+Cut the first few seconds of every melody in stations.json into a small
+preview MP3 under audio/previews/, so pages can start playback without
+waiting for the full file.
+
+Clips are cut at exact frame boundaries without re-encoding: the ID3v2 tag is
+copied as-is, the Xing/Info header frame is rewritten for the shorter clip
+(frame and byte counts, seek TOC, LAME music length and CRCs), and whole audio
+frames follow. Files that are already shorter than the clip get no preview.
+
+Sources are cached by content hash in audio/previews/manifest.json, so only
+new or changed files are cut again (a fresh clone re-cuts nothing); clips are
+cut in parallel. The preview path is written into stations.json as a "preview"
+field right after each "file" field, keeping the rest of the file's formatting
+untouched, and rows whose file has no clip lose a stale one. Melody pages and
+the mobile menu player start on the clip and move to the full file once it
+has loaded. build.py runs this before every stage that reads stations.json.
+
+Usage:
+    python preview_clips.py                  # cut previews, update stations.json
+    python preview_clips.py --seconds 6      # longer clips
+    python preview_clips.py --no-stations    # only (re)build the clips
+"""
+
+import argparse
+import hashlib
+import json
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from build_utils import load_manifest, save_manifest
+from mp3_frames import find_first_frame, id3v2_size, info_tag_offset, iter_frames, rewrite_info_frame
+from radio_playlists import load_missing, load_stations, playable_rows
+
+OUTPUT_DIR = Path('audio/previews')
+MANIFEST_FILE = OUTPUT_DIR / 'manifest.json'
+STATIONS_FILE = Path('stations.json')
+
+JSON_STRING = r'"(?:[^"\\]|\\.)*"'
+FILE_FIELD = re.compile(
+    rf'^(?P<indent>[ \t]*)"file": (?P<file>{JSON_STRING})(?:,\s*"preview": {JSON_STRING})?(?P<comma>,?)',
+    re.MULTILINE,
+)
+
+
+def cut_preview(data: bytes, seconds: float) -> Optional[bytes]:
+    """Return the first `seconds` of an MP3 as a valid file, or None if it is shorter."""
+    id3 = id3v2_size(data)
+    first = find_first_frame(data, id3)
+    if not first:
+        return None
+    info = first if info_tag_offset(data, first) is not None else None
+
+    target = seconds * first['sample_rate']
+    frames, samples = [], 0
+    for frame in iter_frames(data):
+        if info and frame['offset'] == info['offset']:
+            continue
+        if samples >= target:
+            break
+        frames.append(frame)
+        samples += frame['samples']
+    else:
+        return None
+    if not frames:
+        return None
+
+    audio = data[frames[0]['offset']:frames[-1]['offset'] + frames[-1]['length']]
+    header = rewrite_info_frame(data, info, frames) if info else b''
+    return data[:id3] + header + audio
+
+
+def preview_path(source: str) -> str:
+    return f"{OUTPUT_DIR}/{Path(source).name}"
+
+
+def source_digest(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def build_preview(job: Dict) -> Dict:
+    """Cut one preview (runs in a worker process) and return its manifest entry."""
+    with open(job['src'], 'rb') as f:
+        data = f.read()
+    clip = cut_preview(data, job['seconds'])
+    entry = {'sha256': job['sha256'], 'seconds': job['seconds'], 'preview': None}
+    if clip is not None:
+        target = preview_path(job['src'])
+        with open(target, 'wb') as f:
+            f.write(clip)
+        entry.update(preview=target, bytes=len(clip))
+    return entry
+
+
+def build_previews(sources, seconds: float, workers: Optional[int] = None) -> Dict:
+    """Cut previews for new or changed sources, drop stale ones; return the manifest."""
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    old = load_manifest(MANIFEST_FILE)
+    manifest, jobs = {}, []
+    for src in sorted(sources):
+        digest = source_digest(src)
+        cached = old.get(src)
+        if (cached and cached.get('sha256') == digest and cached['seconds'] == seconds
+                and (cached['preview'] is None or Path(cached['preview']).exists())):
+            manifest[src] = cached
+        else:
+            jobs.append({'src': src, 'sha256': digest, 'seconds': seconds})
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for job, entry in zip(jobs, pool.map(build_preview, jobs, chunksize=8)):
+                manifest[job['src']] = entry
+
+    keep = {entry['preview'] for entry in manifest.values() if entry['preview']}
+    for path in OUTPUT_DIR.glob('*.mp3'):
+        if str(path) not in keep:
+            path.unlink()
+
+    save_manifest(MANIFEST_FILE, manifest)
+    return {'manifest': manifest, 'cut': len(jobs)}
+
+
+def record_previews(manifest: Dict) -> int:
+    """Write "preview" next to every "file" in stations.json; return rows changed."""
+    content = STATIONS_FILE.read_text(encoding='utf-8')
+    changed = 0
+
+    def replace(match):
+        nonlocal changed
+        file = json.loads(match.group('file'))
+        entry = manifest.get(file.strip().lstrip('/'))
+        text = f'{match.group("indent")}"file": {match.group("file")}'
+        if entry and entry['preview']:
+            text += f',\n{match.group("indent")}"preview": {json.dumps(entry["preview"], ensure_ascii=False)}'
+        text += match.group('comma')
+        if text != match.group(0):
+            changed += 1
+        return text
+
+    updated = FILE_FIELD.sub(replace, content)
+    if updated != content:
+        json.loads(updated)  # never write an invalid catalog
+        STATIONS_FILE.write_text(updated, encoding='utf-8')
+    return changed
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Cut fast-start preview clips from the melody library')
+    parser.add_argument('--seconds', type=float, default=4.0, help='Preview length (default: 4)')
+    parser.add_argument('--no-stations', action='store_true', help='Do not update stations.json')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    rows = playable_rows(load_stations(str(STATIONS_FILE)), load_missing())
+    sources = {row['file'].strip().lstrip('/') for row in rows}
+    result = build_previews(sources, args.seconds, args.workers)
+    previews = [e for e in result['manifest'].values() if e['preview']]
+    total = sum(e['bytes'] for e in previews)
+    print(f"✂️  {len(sources)} melodies, {len(previews)} previews ({total / 1024 / 1024:.1f} MB), "
+          f"{result['cut']} cut this run")
+
+    if not args.no_stations:
+        changed = record_previews(result['manifest'])
+        print(f"📝 Updated {changed} rows in {STATIONS_FILE}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Radio Playlists
+===============
+Precompute the shuffled playlists used by radio.html so the browser no longer
+downloads the whole of stations.json before the first melody plays.
+
+For every company, every line and the combined "all" selection a weighted
+shuffle is generated: melodies used at many stations are weighted down so
+they do not dominate, and the same audio file never plays twice in a row.
+Selections that mix in 首都圏 (JRE) melodies also get a variant without them
+for the radio's skip option, so the filter applies before paging. Each
+playlist is split into small pages with per-entry durations, which the radio
+uses to warm up the next track before the current one ends, and
+radio/index.json lists the playlists and their page counts. The radio picks a
+random start page and track, so visitors do not all hear the same sequence.
+
+Output (unchanged pages are not rewritten):
+    radio/index.json
+    radio/<playlist id>-<page>.json
+
+Usage:
+    python radio_playlists.py
+    python radio_playlists.py --page-size 50 --seed 2025
+"""
+
+import argparse
+import hashlib
+import json
+import random
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from build_utils import write_if_changed
+from mp3_frames import duration_ms
+
+OUTPUT_DIR = Path('radio')
+INDEX_FILE = OUTPUT_DIR / 'index.json'
+ALL = ''  # matches the "すべての会社/路線" option value in radio.html
+
+ENTRY_FIELDS = ('company', 'line', 'station', 'track', 'bound', 'melody', 'file')
+# Melodies dropped by the radio's "skip 首都圏" option
+SHUTOKEN_PREFIX = 'JRE'
+
+
+def load_stations(path: str = 'stations.json') -> List[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_missing(path: str = 'missing_melodies.txt') -> set:
+    """Return the audio files listed as missing by stationmelodies.py."""
+    if not Path(path).exists():
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def playable_rows(stations: List[Dict], missing: set) -> List[Dict]:
+    """Keep rows whose audio file exists (same rules as hasValidAudio)."""
+    rows = []
+    for station in stations:
+        file = (station.get('file') or '').strip()
+        if not file or file in ('.mp3', 'undefined', 'null'):
+            continue
+        if file in missing or Path(file.replace('audio/', '', 1)).name in missing:
+            continue
+        if not Path(file.lstrip('/')).is_file():
+            continue
+        rows.append(station)
+    return rows
+
+
+def measure_durations(files: List[str], workers: Optional[int] = None) -> Dict[str, int]:
+    """Return {file: duration_ms} for the given audio files."""
+    files = sorted(set(files))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(files, pool.map(lambda f: duration_ms(f.lstrip('/')), files)))
+
+
+def weighted_shuffle(rows: List[Dict], rng: random.Random) -> List[Dict]:
+    """Shuffle rows, weighting each by 1 / (number of rows sharing its file)."""
+    usage = Counter(row['file'] for row in rows)
+    # Efraimidis-Spirakis: order by u ** (1 / weight), descending
+    keyed = [(rng.random() ** usage[row['file']], i) for i, row in enumerate(rows)]
+    keyed.sort(reverse=True)
+    return [rows[i] for _, i in keyed]
+
+
+def spread_repeats(rows: List[Dict]) -> List[Dict]:
+    """Reorder so that no two adjacent entries share an audio file, where possible."""
+    rows = list(rows)
+    for i in range(1, len(rows)):
+        if rows[i]['file'] != rows[i - 1]['file']:
+            continue
+        for j in range(i + 1, len(rows)):
+            if rows[j]['file'] != rows[i - 1]['file']:
+                rows[i], rows[j] = rows[j], rows[i]
+                break
+    return rows
+
+
+def playlist_id(company: str, line: str, skip_shutoken: bool = False) -> str:
+    """Return a short, URL-safe id for a company/line selection."""
+    key = f"{company}\x00{line}" + ('\x00skip-shutoken' if skip_shutoken else '')
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:10]
+
+
+def is_shutoken(row: Dict) -> bool:
+    return (row.get('melody') or '').startswith(SHUTOKEN_PREFIX)
+
+
+def build_playlists(rows: List[Dict], durations: Dict[str, int], seed: int) -> Dict:
+    """Return {(company, line, skip_shutoken): [entries]} for every selectable combination.
+
+    The skip_shutoken variant only exists where it differs from the full playlist.
+    """
+    selections = {}
+    for row in rows:
+        for key in ((ALL, ALL), (row['company'], ALL), (ALL, row['line']), (row['company'], row['line'])):
+            selections.setdefault(key, []).append(row)
+
+    playlists = {}
+    for (company, line), selection in selections.items():
+        rng = random.Random(f"{seed}:{company}:{line}")
+        ordered = spread_repeats(weighted_shuffle(selection, rng))
+        variants = {False: ordered}
+        if any(is_shutoken(row) for row in ordered):
+            variants[True] = spread_repeats([row for row in ordered if not is_shutoken(row)])
+        for skip_shutoken, variant in variants.items():
+            playlists[(company, line, skip_shutoken)] = [
+                dict({field: row.get(field, '') for field in ENTRY_FIELDS},
+                     duration=durations.get(row['file'], 0))
+                for row in variant
+            ]
+    return playlists
+
+
+def compact_json(payload) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+
+
+def write_playlists(playlists: Dict, page_size: int) -> Dict:
+    """Write the paged playlists and index; return write statistics."""
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    index = {'pageSize': page_size, 'playlists': {}}
+    expected = {INDEX_FILE.name}
+    written = 0
+
+    def write_pages(pid: str, entries: List[Dict]) -> Dict:
+        nonlocal written
+        pages = [entries[i:i + page_size] for i in range(0, len(entries), page_size)]
+        for number, page in enumerate(pages):
+            path = OUTPUT_DIR / f"{pid}-{number}.json"
+            expected.add(path.name)
+            written += write_if_changed(path, compact_json(page))
+        return {
+            'id': pid,
+            'count': len(entries),
+            'pages': len(pages),
+            'duration': sum(entry['duration'] for entry in entries),
+        }
+
+    for (company, line, skip_shutoken), entries in sorted(playlists.items()):
+        if skip_shutoken:
+            continue
+        summary = write_pages(playlist_id(company, line), entries)
+        entry = {'id': summary['id'], 'company': company, 'line': line,
+                 **{key: summary[key] for key in ('count', 'pages', 'duration')}}
+        variant = playlists.get((company, line, True))
+        if variant is not None:
+            # An empty variant (all 首都圏) has no pages; the radio reports that
+            entry['skipShutoken'] = write_pages(playlist_id(company, line, True), variant)
+        index['playlists'][f"{company}|{line}"] = entry
+
+    written += write_if_changed(INDEX_FILE, compact_json(index))
+
+    removed = 0
+    for stale in OUTPUT_DIR.glob('*.json'):
+        if stale.name not in expected:
+            stale.unlink()
+            removed += 1
+    return {'files': len(expected), 'written': written, 'removed': removed}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Precompute radio.html playlists')
+    parser.add_argument('--page-size', type=int, default=50, help='Entries per page (default: 50)')
+    parser.add_argument('--seed', type=int, default=0, help='Shuffle seed (default: 0)')
+    args = parser.parse_args(argv)
+
+    rows = playable_rows(load_stations(), load_missing())
+    durations = measure_durations([row['file'] for row in rows])
+    playlists = build_playlists(rows, durations, args.seed)
+    stats = write_playlists(playlists, args.page_size)
+
+    print(f"📻 {len(playlists)} playlists (with skip-首都圏 variants) from {len(rows)} playable rows "
+          f"({len(durations)} audio files)")
+    print(f"✅ {stats['written']} of {stats['files']} files written, {stats['removed']} stale removed")
+
+
+if __name__ == '__main__':
+    main()
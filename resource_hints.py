@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Resource Hints
+==============
+Preload the melody a visitor is most likely to play on station, melody and
+line pages, so it is already downloading when they tap it, and inject
+<link rel="prefetch"> hints for the pages they are likely to open next.
+
+Each page's static <audio> sources are ranked by play count from a local
+play_aggregator.py store (melodyPlays), or from any {"audio/x.mp3": count}
+export. Without counts the ranking falls back to line order, i.e. the order
+the page lists them (line by line, track by track). The top-ranked melody's
+<audio> element gets preload="auto" (browsers do not honour
+<link rel="preload" as="audio">). Pages linked from the content (not the
+header or menu) are ranked by the plays of their own melodies, and the top
+ones are prefetched. Everything a page hints must fit in a per-page byte
+budget: the MP3 size for the preload, the HTML size for each prefetch.
+
+Prefetch hints go in a marked block right before </head>. The block and the
+preload attribute are replaced in place on re-runs and removed when a page has
+nothing to hint. Pages are scanned and rewritten in parallel, and only pages
+whose hints changed are written.
+
+Usage:
+    python resource_hints.py                            # uses play_counts.json if present
+    python resource_hints.py --counts export.json --budget 768
+    python resource_hints.py --remove                   # strip all hints
+"""
+
+import argparse
+import html
+import json
+import os
+import posixpath
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import unquote
+
+from asset_fingerprint import unhash
+from page_audit import find_spans
+from update_headers import find_html_files, rewrite_file, splice
+
+COUNTS_FILE = Path('play_counts.json')
+SECTIONS = ('stations', 'melodies', 'jr-east', 'tokyo-metro', 'toei')
+
+DEFAULT_BUDGET_KB = 512
+DEFAULT_PREFETCH = 3
+
+BLOCK_START = '<!-- resource-hints -->'
+BLOCK_END = '<!-- /resource-hints -->'
+HINTS_BLOCK = re.compile(rf'\n?{re.escape(BLOCK_START)}.*?{re.escape(BLOCK_END)}', re.DOTALL)
+# Written right after "<audio" so it can be told apart from a hand-written preload
+AUDIO_PRELOAD = ' preload="auto"'
+PRELOADED_AUDIO = re.compile(rf'(<audio){re.escape(AUDIO_PRELOAD)}(?=[\s>])', re.IGNORECASE)
+
+AUDIO_SRC = re.compile(r'<audio\b[^>]*?\bsrc="([^"]+)"', re.IGNORECASE)
+PAGE_LINK = re.compile(r'<a\b[^>]*?\bhref="([^"]+\.html)"', re.IGNORECASE)
+BOILERPLATE = {'header', 'menu-css', 'menu-html', 'menu-js'}
+
+
+def resolve(value: str, page: str) -> Optional[str]:
+    """Resolve a same-site reference on a page to a path from the site root."""
+    value = html.unescape(value)
+    if '${' in value or re.match(r'^(?:[a-z][a-z0-9+.-]*:|//)', value, re.IGNORECASE):
+        return None
+    path = unquote(value)
+    if path.startswith('/'):
+        path = path.lstrip('/')
+    else:
+        path = posixpath.join(posixpath.dirname(page), path)
+    path = posixpath.normpath(path)
+    return None if path.startswith('..') else path
+
+
+def strip_hints(content: str) -> str:
+    """Return the page content without anything this tool added."""
+    return PRELOADED_AUDIO.sub(r'\1', HINTS_BLOCK.sub('', content))
+
+
+def scan_page(page: str) -> Dict:
+    """Collect the audio sources and content links of one page (runs in a worker process)."""
+    with open(page, 'r', encoding='utf-8') as f:
+        content = f.read()
+    skip = [(start, end) for component, start, end in find_spans(content) if component in BOILERPLATE]
+
+    audio, seen = [], set()
+    for match in AUDIO_SRC.finditer(content):
+        path = resolve(match.group(1), page)
+        if path and path not in seen:
+            seen.add(path)
+            audio.append((match.group(1), unhash(path)))
+
+    links, seen = [], {page}
+    for match in PAGE_LINK.finditer(content):
+        if any(start <= match.start() < end for start, end in skip):
+            continue
+        path = resolve(match.group(1), page)
+        if path and path not in seen:
+            seen.add(path)
+            links.append((match.group(1), path))
+    # Sized without its own hints, so adding hints never changes what fits a budget
+    size = len(strip_hints(content).encode('utf-8'))
+    return {'page': page, 'size': size, 'audio': audio, 'links': links}
+
+
+def load_counts(path: Path) -> Dict[str, int]:
+    """Return {audio path: plays} from a play_aggregator store or a plain export."""
+    if not path.exists():
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    plays = data.get('melodyPlays', data)
+    return {unhash(key.strip().lstrip('/')): count for key, count in plays.items()
+            if isinstance(count, (int, float))}
+
+
+def file_size(path: str) -> Optional[int]:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def plan_hints(scans: List[Dict], counts: Dict[str, int], budget: int, prefetch: int) -> Dict[str, List[tuple]]:
+    """Return {page: [(rel, href), ...]} within the byte budget of each page."""
+    page_plays = {scan['page']: sum(counts.get(logical, 0) for _, logical in scan['audio']) for scan in scans}
+    page_sizes = {scan['page']: scan['size'] for scan in scans}
+    hints = {}
+    for scan in scans:
+        chosen, spent = [], 0
+        # Stable sort: equal counts (or no counts at all) keep line order
+        for href, logical in sorted(scan['audio'], key=lambda item: -counts.get(item[1], 0)):
+            size = file_size(logical)
+            if size is not None and size <= budget:
+                chosen.append(('preload', href))
+                spent = size
+                break
+        candidates = [(href, path) for href, path in scan['links'] if path in page_sizes]
+        for href, path in sorted(candidates, key=lambda item: -page_plays[item[1]])[:prefetch]:
+            if spent + page_sizes[path] <= budget:
+                chosen.append(('prefetch', href))
+                spent += page_sizes[path]
+        hints[scan['page']] = chosen
+    return hints
+
+
+def render_block(hints: List[tuple]) -> str:
+    """Return the prefetch block for a page's hints, or '' if it prefetches nothing."""
+    links = [f'  <link rel="prefetch" href="{href}">' for rel, href in hints if rel == 'prefetch']
+    if not links:
+        return ''
+    return '\n' + '\n'.join([BLOCK_START, *links, BLOCK_END])
+
+
+def apply_hints(content: str, hints: List[tuple]) -> str:
+    """Replace the page's hints with `hints` (empty removes them) in one pass."""
+    edits = [(match.start(), match.end(), '') for match in HINTS_BLOCK.finditer(content)]
+
+    preload = next((href for rel, href in hints if rel == 'preload'), None)
+    target = next((match.start() for match in AUDIO_SRC.finditer(content) if match.group(1) == preload), None)
+    for match in PRELOADED_AUDIO.finditer(content):
+        if match.start() != target:
+            edits.append((match.start(), match.end(), match.group(1)))
+    if target is not None and not PRELOADED_AUDIO.match(content, target):
+        edits.append((target + len('<audio'), target + len('<audio'), AUDIO_PRELOAD))
+
+    block = render_block(hints)
+    head_end = content.find('</head>')
+    if block and head_end != -1:
+        # Keep the block on its own line right before </head>
+        line_start = content.rfind('\n', 0, head_end)
+        position = head_end if line_start == -1 else line_start
+        edits.append((position, position, block))
+    return splice(content, edits)
+
+
+def write_hints(job: tuple) -> bool:
+    """Rewrite one page's hints (runs in a worker process)."""
+    page, hints = job
+    return rewrite_file(page, lambda content: apply_hints(content, hints))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Inject popularity-ranked preload and prefetch hints')
+    parser.add_argument('--counts', default=str(COUNTS_FILE),
+                        help=f'Play count store or export (default: {COUNTS_FILE})')
+    parser.add_argument('--budget', type=int, default=DEFAULT_BUDGET_KB,
+                        help=f'Hinted bytes per page, in KB (default: {DEFAULT_BUDGET_KB})')
+    parser.add_argument('--prefetch', type=int, default=DEFAULT_PREFETCH,
+                        help=f'Pages to prefetch at most (default: {DEFAULT_PREFETCH})')
+    parser.add_argument('--remove', action='store_true', help='Remove all hints')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    pages = [page for page in find_html_files() if Path(page).parts[0] in SECTIONS]
+    counts = {} if args.remove else load_counts(Path(args.counts))
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        if args.remove:
+            hints = {page: [] for page in pages}
+        else:
+            scans = list(pool.map(scan_page, pages, chunksize=32))
+            hints = plan_hints(scans, counts, args.budget * 1024, args.prefetch)
+        written = sum(pool.map(write_hints, hints.items(), chunksize=32))
+
+    preloads = sum(1 for chosen in hints.values() if any(rel == 'preload' for rel, _ in chosen))
+    prefetches = sum(1 for chosen in hints.values() for rel, _ in chosen if rel == 'prefetch')
+    ranking = f"{len(counts)} play counts" if counts else 'line order'
+    print(f"🔮 {len(pages)} pages ({ranking}): {preloads} preloads, {prefetches} prefetches; "
+          f"{written} pages rewritten")
+
+
+if __name__ == '__main__':
+    main()
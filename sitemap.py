@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Sitemap
+=======
+Generate sitemap.xml as a sitemap index over per-section sitemaps, with
+lastmod dates that only move when a page's content really changes.
+
+Each page is hashed after removing everything that is rewritten site-wide:
+the header and mobile menu blocks injected by update_headers.py, the whole
+<head> (critical CSS, resource hints, shared meta), every <script> and <style>,
+the audio preload from resource_hints.py and asset fingerprints from
+asset_fingerprint.py. <picture> markup from image_optimizer.py is put back to
+the <img> it replaced, and the size attributes it rewrites are ignored on
+every <img>. A page's lastmod is bumped to today only when that hash changes,
+so a bulk header, script or image update no longer marks every page as
+modified.
+Hashes and dates are kept in sitemap_manifest.json (committed, so dates survive
+fresh checkouts); on the first run they are seeded from the existing
+single-file sitemap.xml. A manifest entry without a hash keeps its date and
+takes the page's current hash.
+
+Output (files whose content is unchanged are not rewritten):
+    sitemap.xml                 sitemap index
+    sitemap-<section>.xml       pages, lines, stations, melodies, listings
+
+Supersedes generate_sitemap.js.
+
+Usage:
+    python sitemap.py
+    python sitemap.py --site-url https://ekimero.com
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from build_utils import load_manifest, write_if_changed
+from critical_css import restore_link
+from image_optimizer import IMG_OR_PICTURE, MANIFEST_FILE as IMAGES_MANIFEST, parse_attrs
+from page_audit import find_spans
+from resource_hints import strip_hints
+from update_headers import find_html_files
+
+SITE_URL = os.environ.get('SITE_URL', 'https://ekimero.com')
+INDEX_FILE = Path('sitemap.xml')
+MANIFEST_FILE = Path('sitemap_manifest.json')
+
+# Top-level pages that belong in the sitemap (templates, backups and
+# verification files are left out)
+ROOT_PAGES = ['index.html', 'jr-east.html', 'tokyo-metro.html', 'toei.html', 'radio.html',
+              'history.html', 'stations.html', 'all-pages.html']
+
+SECTIONS = {
+    'pages': None,
+    'lines': ('jr-east', 'tokyo-metro', 'toei'),
+    'stations': ('stations',),
+    'melodies': ('melodies',),
+    'listings': ('listings',),
+}
+
+# Sitemap protocol limit per file
+MAX_URLS = 50000
+
+BOILERPLATE = {'header', 'menu-css', 'menu-html', 'menu-js'}
+FINGERPRINTED = re.compile(r'/assets/([^"\s]+?)\.[0-9a-f]{8}(\.\w+)')
+VERSIONED = re.compile(r'(\.mp3)\?v=[0-9a-f]{8}')
+UNHASHED_BLOCKS = re.compile(r'<head\b.*?</head>|<script\b.*?</script>|<style\b.*?</style>', re.IGNORECASE | re.DOTALL)
+PICTURE_IMG = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+# Attributes image_optimizer.py replaces on the <img> it wraps
+IMG_SIZE_ATTR = re.compile(r'\s(?:width|height|srcset|sizes)="[^"]*"', re.IGNORECASE)
+
+# Set in each worker process by init_worker: optimized variant src -> original src
+_SOURCES: Dict[str, str] = {}
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+INDEX_OPEN = '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+
+
+def section_of(page: str) -> Optional[str]:
+    """Return the sitemap section of a page, or None if it is not listed."""
+    parts = Path(page).parts
+    if Path(page).name.startswith('.'):
+        return None
+    if len(parts) == 1:
+        return 'pages' if page in ROOT_PAGES else None
+    for section, folders in SECTIONS.items():
+        if folders and parts[0] in folders:
+            return section
+    return None
+
+
+def page_url(page: str, site_url: str) -> str:
+    if page == 'index.html':
+        return site_url.rstrip('/') + '/'
+    # Same encoding as encodeURIComponent per path segment
+    return site_url.rstrip('/') + '/' + '/'.join(quote(part, safe="!'()*-._~") for part in Path(page).parts)
+
+
+def variant_sources() -> Dict[str, str]:
+    """Map every optimized variant from images/optimized/manifest.json to the src it replaced."""
+    return {f"/{variant['png']}": src
+            for src, entry in load_manifest(IMAGES_MANIFEST).items() for variant in entry['variants']}
+
+
+def original_img(tag: str, sources: Dict[str, str]) -> str:
+    """Return a <picture> (or a plain <img>) as the <img> before image_optimizer.py, sizes left out."""
+    img = PICTURE_IMG.search(tag).group(0) if tag[1:4].lower() != 'img' else tag
+    src = parse_attrs(img).get('src', '')
+    if src in sources:
+        img = img.replace(f'src="{src}"', f'src="{sources[src]}"', 1)
+    return IMG_SIZE_ATTR.sub('', img)
+
+
+def meaningful_content(content: str, sources: Optional[Dict[str, str]] = None) -> str:
+    """Return the page without the blocks that are rewritten across the whole site."""
+    content = restore_link(content)
+    for component, start, end in sorted(find_spans(content), key=lambda s: -s[1]):
+        if component in BOILERPLATE:
+            content = content[:start] + content[end:]
+    content = strip_hints(content)
+    content = FINGERPRINTED.sub(r'/\1\2', content)
+    content = VERSIONED.sub(r'\1', content)
+    content = UNHASHED_BLOCKS.sub('', content)
+    content = IMG_OR_PICTURE.sub(lambda m: original_img(m.group(0), sources or {}), content)
+    return ' '.join(content.split())
+
+
+def init_worker(sources: Dict[str, str]):
+    global _SOURCES
+    _SOURCES = sources
+
+
+def page_digest(page: str) -> str:
+    """Hash the meaningful content of one page (runs in a worker process)."""
+    with open(page, 'r', encoding='utf-8') as f:
+        content = f.read()
+    return hashlib.sha256(meaningful_content(content, _SOURCES).encode('utf-8')).hexdigest()[:16]
+
+
+def load_lastmods() -> Dict[str, List[str]]:
+    """Return {url: [digest, lastmod]}, seeded from an old single-file sitemap."""
+    if MANIFEST_FILE.exists():
+        return load_manifest(MANIFEST_FILE)
+    manifest = {}
+    if INDEX_FILE.exists():
+        text = INDEX_FILE.read_text(encoding='utf-8')
+        if '<urlset' in text:
+            for loc, lastmod in re.findall(r'<loc>([^<]+)</loc>\s*<lastmod>([^<]+)</lastmod>', text):
+                manifest[loc.strip()] = [None, lastmod.strip()]
+    return manifest
+
+
+def render_urlset(entries: List[tuple]) -> str:
+    body = ''.join(f"  <url>\n    <loc>{escape(loc)}</loc>\n    <lastmod>{lastmod}</lastmod>\n  </url>\n"
+                   for loc, lastmod in entries)
+    return XML_HEADER + URLSET_OPEN + body + '</urlset>\n'
+
+
+def render_index(sitemaps: List[tuple]) -> str:
+    body = ''.join(f"  <sitemap>\n    <loc>{escape(loc)}</loc>\n    <lastmod>{lastmod}</lastmod>\n  </sitemap>\n"
+                   for loc, lastmod in sitemaps)
+    return XML_HEADER + INDEX_OPEN + body + '</sitemapindex>\n'
+
+
+def build_sitemaps(pages: List[str], site_url: str, today: str, workers: Optional[int] = None) -> Dict:
+    """Update lastmod dates and write changed section files and the index."""
+    listed = [(page, section_of(page)) for page in pages]
+    listed = [(page, section) for page, section in listed if section]
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(variant_sources(),)) as pool:
+        digests = list(pool.map(page_digest, [page for page, _ in listed], chunksize=32))
+
+    old = load_lastmods()
+    manifest, sections, changed_pages = {}, {}, 0
+    for (page, section), digest in zip(listed, digests):
+        url = page_url(page, site_url)
+        previous = old.get(url)
+        if previous and (previous[0] is None or previous[0] == digest):
+            lastmod = previous[1]
+        else:
+            lastmod = today
+            changed_pages += 1
+        manifest[url] = [digest, lastmod]
+        sections.setdefault(section, []).append((url, lastmod))
+
+    written, index_entries, files = [], [], set()
+    for section in SECTIONS:
+        entries = sorted(sections.get(section, []))
+        for number, start in enumerate(range(0, len(entries), MAX_URLS)):
+            chunk = entries[start:start + MAX_URLS]
+            name = f"sitemap-{section}.xml" if number == 0 else f"sitemap-{section}-{number + 1}.xml"
+            files.add(name)
+            if write_if_changed(Path(name), render_urlset(chunk)):
+                written.append(name)
+            index_entries.append((f"{site_url.rstrip('/')}/{name}", max(lastmod for _, lastmod in chunk)))
+
+    if write_if_changed(INDEX_FILE, render_index(index_entries)):
+        written.append(str(INDEX_FILE))
+    # Section files that no longer have entries, and the old gzipped single-file sitemap
+    for path in list(Path('.').glob('sitemap-*.xml')) + [Path('sitemap.xml.gz')]:
+        if path.exists() and path.name not in files:
+            path.unlink()
+
+    # One URL per line keeps the committed manifest's diffs readable
+    lines = [f"{json.dumps(url, ensure_ascii=False)}: {json.dumps(value)}" for url, value in sorted(manifest.items())]
+    with open(MANIFEST_FILE, 'w', encoding='utf-8') as f:
+        f.write('{\n' + ',\n'.join(lines) + '\n}\n')
+    return {'urls': len(manifest), 'changed': changed_pages, 'written': written}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Generate a sitemap index with content-based lastmod')
+    parser.add_argument('--site-url', default=SITE_URL, help=f'Site URL (default: {SITE_URL})')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    today = datetime.now(timezone.utc).date().isoformat()
+    stats = build_sitemaps(find_html_files(include_index=True), args.site_url, today, args.workers)
+    print(f"🗺️  {stats['urls']} URLs, {stats['changed']} with a new lastmod; "
+          f"wrote {', '.join(stats['written']) or 'nothing'}")
+
+
+if __name__ == '__main__':
+    main()